@@ -0,0 +1,264 @@
+"""
+This module provides win rate analytics over the games of a
+`gameindex.GameIndex`.
+
+Players of the indexed games are loaded into columnar NumPy arrays, one row per
+player of a game, with categorical codes for player, map and side. Filters are
+boolean masks and group-by queries a single `numpy.bincount` over a combined
+group code, so queries over 100k games take milliseconds.
+"""
+
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy
+
+import gameindex
+import mappings
+
+# Columns usable as filters and group-by keys. Opponents are only known in
+# games of two players.
+CATEGORICAL_COLUMNS = ("player", "map", "side", "result", "opponent", "opponent_side")
+
+# Above this number of possible groups, groups are found by sorting instead.
+_MAX_BINCOUNT_GROUPS = 2**20
+
+_PlayerRowType = Tuple[int, str, int, str, Optional[str], str]
+
+
+class Categories:
+    """
+    Class for codes of category names, in order of first appearance.
+    """
+
+    __slots__ = ("names", "_codes")
+
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        self.names: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for name in names:
+            self.code(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def code(self, name: str) -> int:
+        """
+        Code of a name, a new one for an unknown name.
+        """
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def get(self, name: str) -> int:
+        """
+        Code of a name, -1 for an unknown name.
+        """
+        return self._codes.get(name, -1)
+
+
+def _codes(values: Sequence[Any], code: Callable[[Any], int]) -> numpy.ndarray:
+    """
+    Codes of a column of values, `code` is called once per distinct value in
+    order of first appearance.
+    """
+    codes = {value: code(value) for value in dict.fromkeys(values)}
+    return numpy.fromiter(map(codes.__getitem__, values), numpy.int32, len(values))
+
+
+class GameColumns:
+    """
+    Class for players of games as columns. Codes of categorical columns are -1
+    where not known, e.g. the opponent in a game of more than two players.
+    """
+
+    def __init__(
+        self,
+        rows: Iterable[_PlayerRowType],
+        resolve_name: Optional[Callable[[str], str]] = None,
+    ) -> None:
+        """
+        Args:
+            rows: Players in time order, see `gameindex.GameIndex.iter_player_rows`.
+            resolve_name: Function resolving aliases of player names.
+        """
+        players = Categories()
+        maps = Categories()
+        sides = Categories(mappings.SIDES.values())
+        results = Categories(gameindex.PLAYER_RESULTS)
+        self.categories: Dict[str, Categories] = {
+            "player": players,
+            "map": maps,
+            "side": sides,
+            "result": results,
+            "opponent": players,
+            "opponent_side": sides,
+        }
+
+        # Built per column, categorical codes are looked up once per distinct
+        # value.
+        rows = list(rows)
+        n = len(rows)
+        self.epoch_time = numpy.fromiter(map(itemgetter(0), rows), numpy.int64, n)
+        self.duration = numpy.fromiter(map(itemgetter(2), rows), numpy.int64, n)
+        self.player = _codes(
+            list(map(itemgetter(3), rows)),
+            lambda name: players.code(
+                resolve_name(name) if resolve_name is not None else name
+            ),
+        )
+        self.map = _codes(list(map(itemgetter(1), rows)), maps.code)
+        self.side = _codes(
+            list(map(itemgetter(4), rows)),
+            lambda side: sides.code(side) if side is not None else -1,
+        )
+        self.result = _codes(list(map(itemgetter(5), rows)), results.code)
+        self.won = self.result == results.get("won")
+        self.opponent, self.opponent_side = self._opponents()
+
+    @classmethod
+    def from_index(
+        cls,
+        index: gameindex.GameIndex,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        resolve_name: Optional[Callable[[str], str]] = None,
+    ) -> "GameColumns":
+        """
+        Load players of indexed games, see `gameindex.GameIndex.iter_games` for
+        arguments.
+        """
+        return cls(index.iter_player_rows(since, until), resolve_name)
+
+    def __len__(self) -> int:
+        return len(self.epoch_time)
+
+    def _opponents(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Player and side of the other player of games of two players.
+        """
+        n = len(self.epoch_time)
+        if n == 0:
+            empty = numpy.empty(0, dtype=numpy.int32)
+            return empty, empty
+        # Rows of a game are adjacent, games are numbered by their first row.
+        first_rows = numpy.flatnonzero(
+            numpy.concatenate(([True], self.epoch_time[1:] != self.epoch_time[:-1]))
+        )
+        game = numpy.repeat(
+            numpy.arange(len(first_rows)), numpy.diff(numpy.append(first_rows, n))
+        )
+        players_in_game = numpy.bincount(game)[game]
+        position = numpy.arange(n) - first_rows[game]
+        other_row = numpy.clip(
+            numpy.where(position == 0, numpy.arange(n) + 1, numpy.arange(n) - 1),
+            0,
+            n - 1,
+        )
+        two_players = players_in_game == 2
+        return (
+            numpy.where(two_players, self.player[other_row], -1).astype(numpy.int32),
+            numpy.where(two_players, self.side[other_row], -1).astype(numpy.int32),
+        )
+
+    def column(self, name: str) -> numpy.ndarray:
+        if name not in CATEGORICAL_COLUMNS:
+            raise ValueError(
+                f"Column should be one of {CATEGORICAL_COLUMNS}, but {name!r} received."
+            )
+        return getattr(self, name)
+
+    def mask(
+        self,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        **filters: Optional[str],
+    ) -> numpy.ndarray:
+        """
+        Rows matching all given filters.
+
+        Args:
+            since: Only games started after this epoch time.
+            until: Only games started at or before this epoch time.
+            min_duration: Only games lasting at least this many seconds.
+            max_duration: Only games lasting at most this many seconds.
+            filters: Names by categorical column, e.g. `side="Yuri"`.
+
+        Returns:
+            Boolean array.
+        """
+        mask = numpy.ones(len(self), dtype=bool)
+        if since is not None:
+            mask &= self.epoch_time > since
+        if until is not None:
+            mask &= self.epoch_time <= until
+        if min_duration is not None:
+            mask &= self.duration >= min_duration
+        if max_duration is not None:
+            mask &= self.duration <= max_duration
+        for name, value in filters.items():
+            if value is not None:
+                # An unknown name matches no row, as its code -1 means unknown.
+                code = self.categories[name].get(value)
+                mask &= (self.column(name) == code) & (code != -1)
+        return mask
+
+    def group_by(
+        self, keys: Sequence[str], mask: Optional[numpy.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Count games, wins and durations of the rows matching `mask` per group.
+
+        Args:
+            keys: Categorical columns to group by, none for a single group.
+            mask: Rows to count, all by default.
+
+        Returns:
+            Groups by descending number of games, with names of the group keys
+            (`None` where unknown), `"games"`, `"wins"`, `"win_rate"` and
+            `"avg_duration_secs"`. Games are counted once per player.
+        """
+        if mask is None:
+            mask = numpy.ones(len(self), dtype=bool)
+        columns = [self.column(key)[mask] + 1 for key in keys]  # -1 becomes 0.
+        sizes = [len(self.categories[key]) + 1 for key in keys]
+
+        group_code = numpy.zeros(int(mask.sum()), dtype=numpy.int64)
+        for column, size in zip(columns, sizes):
+            group_code = group_code * size + column
+        number_of_groups = int(numpy.prod(sizes, dtype=numpy.int64))
+        group_codes: Optional[numpy.ndarray] = None
+        if number_of_groups <= _MAX_BINCOUNT_GROUPS:
+            group_ids = group_code
+        else:
+            group_codes, group_ids = numpy.unique(group_code, return_inverse=True)
+            number_of_groups = len(group_codes)
+        games = numpy.bincount(group_ids, minlength=number_of_groups)
+        wins = numpy.bincount(
+            group_ids, weights=self.won[mask], minlength=number_of_groups
+        )
+        durations = numpy.bincount(
+            group_ids, weights=self.duration[mask], minlength=number_of_groups
+        )
+
+        groups = []
+        for group_id in numpy.flatnonzero(games):
+            code = int(group_id if group_codes is None else group_codes[group_id])
+            group: Dict[str, Any] = {}
+            for key, size in reversed(list(zip(keys, sizes))):
+                code, key_code = divmod(code, size)
+                group[key] = (
+                    self.categories[key].names[key_code - 1] if key_code else None
+                )
+            group = {key: group[key] for key in keys}
+            group["games"] = int(games[group_id])
+            group["wins"] = int(wins[group_id])
+            group["win_rate"] = group["wins"] / group["games"]
+            group["avg_duration_secs"] = float(durations[group_id]) / group["games"]
+            groups.append(group)
+        groups.sort(key=lambda group: group["games"], reverse=True)
+        return groups
@@ -0,0 +1,248 @@
+"""
+This module provides an append-only archive of games, an alternative to a
+folder per game as written by `statparser.process_stats`.
+
+Games are appended to segment files as length-prefixed records holding the
+compact prettified stats in JSON format and the raw `"stats.dmp"` contents.
+A sidecar index maps epoch time of each game to its segment and byte offset,
+so time range queries seek straight to the matching records.
+"""
+
+import bisect
+import glob
+import json
+import os
+from struct import Struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import statparser
+
+_GameStatsType = Dict[str, Any]
+
+DEFAULT_MAX_SEGMENT_SIZE = 256 * 2**20
+
+INDEX_FILE = "index.bin"
+SEGMENT_FILE_PATTERN = "segment-{:05d}.bin"
+
+# Lengths of the prettified stats and of the raw "stats.dmp" contents.
+_RECORD_HEADER_STRUCT = Struct(">II")
+# Epoch time, segment number and offset of a record.
+_INDEX_ENTRY_STRUCT = Struct(">qHQ")
+
+
+class GameArchive:
+    """
+    Class for an append-only archive of games in a folder. There is one game
+    per epoch time, appending a game with a known epoch time is a no-op.
+    """
+
+    def __init__(
+        self, folder: str, max_segment_size: int = DEFAULT_MAX_SEGMENT_SIZE
+    ) -> None:
+        self.folder = folder
+        self.max_segment_size = max_segment_size
+        os.makedirs(folder, exist_ok=True)
+        # Sorted by epoch time.
+        self._epoch_times: List[int] = []
+        self._positions: List[Tuple[int, int]] = []
+        self._load_index()
+        self._segment = self._last_segment()
+
+    def __len__(self) -> int:
+        return len(self._epoch_times)
+
+    def __contains__(self, epoch_time: int) -> bool:
+        i = bisect.bisect_left(self._epoch_times, epoch_time)
+        return i < len(self._epoch_times) and self._epoch_times[i] == epoch_time
+
+    def _segment_file(self, segment: int) -> str:
+        return os.path.join(self.folder, SEGMENT_FILE_PATTERN.format(segment))
+
+    def _load_index(self) -> None:
+        """
+        Load the index, skipping entries of records which were not fully
+        written, e.g. due to a crash.
+        """
+        index_file = os.path.join(self.folder, INDEX_FILE)
+        if not os.path.isfile(index_file):
+            return
+        with open(index_file, "rb") as file:
+            binary_blob = file.read()
+        torn_length = len(binary_blob) % _INDEX_ENTRY_STRUCT.size
+        if torn_length:
+            # Drop a partially written last entry, later entries have to align.
+            binary_blob = binary_blob[:-torn_length]
+            with open(index_file, "r+b") as file:
+                file.truncate(len(binary_blob))
+        segment_sizes: Dict[int, int] = {}
+        entries = []
+        entry_length = _INDEX_ENTRY_STRUCT.size
+        for offset in range(0, len(binary_blob), entry_length):
+            epoch_time, segment, record_offset = _INDEX_ENTRY_STRUCT.unpack_from(
+                binary_blob, offset
+            )
+            if segment not in segment_sizes:
+                segment_file = self._segment_file(segment)
+                segment_sizes[segment] = (
+                    os.path.getsize(segment_file) if os.path.isfile(segment_file) else 0
+                )
+            if record_offset < segment_sizes[segment]:
+                entries.append((epoch_time, segment, record_offset))
+        # Appends are mostly in time order, so this is cheap.
+        entries.sort()
+        self._epoch_times = [entry[0] for entry in entries]
+        self._positions = [(entry[1], entry[2]) for entry in entries]
+
+    def _last_segment(self) -> int:
+        segment_files = glob.glob(os.path.join(self.folder, "segment-*.bin"))
+        if not segment_files:
+            return 0
+        return max(
+            int(os.path.basename(segment_file)[len("segment-") : -len(".bin")])
+            for segment_file in segment_files
+        )
+
+    def append(self, stats: _GameStatsType, dmp: bytes = b"") -> bool:
+        """
+        Append a game.
+
+        Args:
+            stats: Prettified stats of the game.
+            dmp: Raw contents of its `"stats.dmp"` file.
+
+        Returns:
+            Whether the game was appended, `False` if already archived.
+        """
+        epoch_time = stats["gameReport"]["epoch_time"]
+        if epoch_time in self:
+            return False
+        binary_stats = json.dumps(stats, separators=(",", ":")).encode("utf-8")
+        record = (
+            _RECORD_HEADER_STRUCT.pack(len(binary_stats), len(dmp)) + binary_stats + dmp
+        )
+
+        segment_file = self._segment_file(self._segment)
+        if (
+            os.path.isfile(segment_file)
+            and os.path.getsize(segment_file) + len(record) > self.max_segment_size
+        ):
+            self._segment += 1
+            segment_file = self._segment_file(self._segment)
+        with open(segment_file, "ab") as file:
+            offset = file.tell()
+            file.write(record)
+        # Index entry goes last, so a partially written record is never indexed.
+        with open(os.path.join(self.folder, INDEX_FILE), "ab") as file:
+            file.write(_INDEX_ENTRY_STRUCT.pack(epoch_time, self._segment, offset))
+
+        i = bisect.bisect_left(self._epoch_times, epoch_time)
+        self._epoch_times.insert(i, epoch_time)
+        self._positions.insert(i, (self._segment, offset))
+        return True
+
+    def _range(self, since: Optional[int], until: Optional[int]) -> Tuple[int, int]:
+        start = 0 if since is None else bisect.bisect_right(self._epoch_times, since)
+        end = (
+            len(self._epoch_times)
+            if until is None
+            else bisect.bisect_right(self._epoch_times, until)
+        )
+        return start, end
+
+    def epoch_times(
+        self, since: Optional[int] = None, until: Optional[int] = None
+    ) -> List[int]:
+        """
+        Epoch times of the archived games, see `iter_games` for arguments.
+        """
+        start, end = self._range(since, until)
+        return self._epoch_times[start:end]
+
+    def iter_games(
+        self,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        with_dmp: bool = False,
+    ) -> Iterator[Tuple[_GameStatsType, Optional[bytes]]]:
+        """
+        Iterate over archived games in time order.
+
+        Args:
+            since: Only games started after this epoch time.
+            until: Only games started at or before this epoch time.
+            with_dmp: Also read the raw `"stats.dmp"` contents.
+
+        Yields:
+            Tuples of prettified stats and raw `"stats.dmp"` contents, the
+            latter is `None` unless `with_dmp` is set.
+        """
+        start, end = self._range(since, until)
+        files = {}
+        try:
+            for segment, offset in self._positions[start:end]:
+                if segment not in files:
+                    files[segment] = open(self._segment_file(segment), "rb")
+                file = files[segment]
+                file.seek(offset)
+                stats_length, dmp_length = _RECORD_HEADER_STRUCT.unpack(
+                    file.read(_RECORD_HEADER_STRUCT.size)
+                )
+                stats = json.loads(file.read(stats_length).decode("utf-8"))
+                dmp = file.read(dmp_length) if with_dmp else None
+                yield stats, dmp
+        finally:
+            for file in files.values():
+                file.close()
+
+    def iter_stats(
+        self, since: Optional[int] = None, until: Optional[int] = None
+    ) -> Iterator[_GameStatsType]:
+        """
+        Iterate over prettified stats of archived games in time order, see
+        `iter_games` for arguments.
+        """
+        for stats, _ in self.iter_games(since, until):
+            yield stats
+
+
+def read_stats(
+    stats_file: str, reporter_name: str, source: Optional[str] = None
+) -> Tuple[_GameStatsType, bytes]:
+    """
+    Parse and prettify a `"stats.dmp"` file for `GameArchive.append`, see
+    `archive_stats` for arguments.
+
+    Returns:
+        Tuple of prettified stats and raw `"stats.dmp"` contents.
+    """
+    with open(stats_file, "rb") as file:
+        dmp = file.read()
+    stats = statparser.prettify_stats(statparser.parse_stats_buffer(dmp), reporter_name)
+    if source is not None:
+        stats["gameReport"]["source"] = source
+    return stats, dmp
+
+
+def archive_stats(
+    archive: GameArchive,
+    stats_file: str,
+    reporter_name: str,
+    source: Optional[str] = None,
+) -> _GameStatsType:
+    """
+    Parse and prettify a `"stats.dmp"` file and append it to an archive, the
+    archive counterpart of `statparser.process_stats`.
+
+    Args:
+        archive: Archive to append to.
+        stats_file: `"stats.dmp"` file.
+        reporter_name: Name of the current player to parse the game status from.
+        source: Game install the game was played on, see
+            `statparser.process_stats`.
+
+    Returns:
+        Prettified stats.
+    """
+    stats, dmp = read_stats(stats_file, reporter_name, source)
+    archive.append(stats, dmp)
+    return stats
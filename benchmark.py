@@ -0,0 +1,351 @@
+"""
+This module benchmarks parsing, prettifying and aggregating stats over
+synthetic games generated by `dmpgen`.
+
+Save a baseline and check a later run against it:
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json
+
+`process_stats_php` compares with statparser.php, it is skipped if `php` is
+not found.
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+
+import dmpgen
+import records
+import statparser
+import yrstats
+
+
+REPORTER_NAME = dmpgen.PLAYER_NAMES[0]
+FIRST_EPOCH_TIME = 1590000000
+# A game a day, so pools of more than a month of games are aggregated in
+# parallel by `aggregate_game_stats_multi`.
+EPOCH_TIME_STEP = 86400
+STATPARSER_PHP = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "statparser.php"
+)
+
+# Only the keys used by aggregation.
+BENCHMARK_CONFIG: Dict[str, Any] = {"playerAliases": []}
+
+
+class SkippedBenchmark(Exception):
+    """
+    Raised by setups of benchmarks which can not run here.
+    """
+
+
+class Fixtures:
+    """
+    Class for a pool of distinct synthetic games in all representations the
+    benchmarks need. Benchmarks cycle through the pool, so its size and not
+    the number of benchmarked games decides disk usage.
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        pool_size: int,
+        players: int,
+        countable_density: float,
+        unknown_tags: int,
+        php_executable: Optional[str] = None,
+    ) -> None:
+        self.folder = folder
+        self.output_folder = os.path.join(folder, "games")
+        self.php_executable = php_executable
+        self.dmp_files: List[str] = []
+        self.raw_stats: List[Dict[str, Any]] = []
+        self.parsed_files: List[str] = []
+        self.records: List[records.GameRecord] = []
+        for i in range(pool_size):
+            dmp_file = os.path.join(folder, f"{i}_stats.dmp")
+            dmpgen.write_stats(
+                dmp_file,
+                players=players,
+                countable_density=countable_density,
+                unknown_tags=unknown_tags,
+                epoch_time=FIRST_EPOCH_TIME + i * EPOCH_TIME_STEP,
+                seed=i,
+            )
+            parsed_file = statparser.process_stats(
+                dmp_file, self.output_folder, REPORTER_NAME
+            )
+            with open(parsed_file, "r") as file:
+                data = json.load(file)
+            self.dmp_files.append(dmp_file)
+            self.raw_stats.append(statparser.parse_stats(dmp_file))
+            self.parsed_files.append(parsed_file)
+            self.records.append(records.GameRecord.from_dict(data))
+
+
+_StepType = Callable[[int], Any]
+
+
+def _aggregate_game_stats(fixtures: Fixtures) -> _StepType:
+    aggregated_stats: Dict[str, Any] = {}
+    start_time = datetime.fromtimestamp(FIRST_EPOCH_TIME)
+    return lambda i: yrstats.aggregate_game_stats(
+        BENCHMARK_CONFIG, aggregated_stats, fixtures.parsed_files[i], start_time
+    )
+
+
+def _aggregate_game_record(fixtures: Fixtures) -> _StepType:
+    aggregated_stats: Dict[str, Any] = {}
+    start_time = datetime.fromtimestamp(FIRST_EPOCH_TIME)
+    return lambda i: yrstats.aggregate_game_record(
+        BENCHMARK_CONFIG, aggregated_stats, fixtures.records[i], start_time
+    )
+
+
+def _process_stats_php(fixtures: Fixtures) -> _StepType:
+    if fixtures.php_executable is None:
+        raise SkippedBenchmark("php not found")
+    return lambda i: subprocess.run(
+        [
+            fixtures.php_executable,
+            STATPARSER_PHP,
+            REPORTER_NAME,
+            fixtures.dmp_files[i],
+            fixtures.output_folder,
+        ],
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+def _aggregate_game_stats_multi(fixtures: Fixtures) -> _StepType:
+    config = dict(BENCHMARK_CONFIG, gameStatsFolder=fixtures.output_folder)
+    since_when = datetime.fromtimestamp(FIRST_EPOCH_TIME - 1)
+
+    def step(i: int) -> Any:
+        # Cached aggregates of months would be used from the second run on.
+        cache_file = yrstats.get_aggregate_cache_file(fixtures.output_folder, "")
+        shutil.rmtree(os.path.dirname(cache_file), True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return yrstats.aggregate_game_stats_multi(config, since_when)
+
+    return step
+
+
+# Benchmark name to a setup returning a step, which processes one game of the
+# pool by its index.
+BENCHMARKS: Dict[str, Callable[[Fixtures], _StepType]] = {
+    "parse_stats": lambda fixtures: lambda i: statparser.parse_stats(
+        fixtures.dmp_files[i]
+    ),
+    "parse_stats_legacy": lambda fixtures: lambda i: statparser.parse_stats_legacy(
+        fixtures.dmp_files[i]
+    ),
+    "prettify_stats": lambda fixtures: lambda i: statparser.prettify_stats(
+        fixtures.raw_stats[i], REPORTER_NAME
+    ),
+    "prettify_stats_legacy": lambda fixtures: lambda i: (
+        statparser.prettify_stats_legacy(fixtures.raw_stats[i], REPORTER_NAME)
+    ),
+    "process_stats": lambda fixtures: lambda i: statparser.process_stats(
+        fixtures.dmp_files[i], fixtures.output_folder, REPORTER_NAME
+    ),
+    "process_stats_php": _process_stats_php,
+    "aggregate_game_stats": _aggregate_game_stats,
+    "aggregate_game_record": _aggregate_game_record,
+}
+
+# Same for steps processing all games of the pool at once, whatever the index.
+BATCH_BENCHMARKS: Dict[str, Callable[[Fixtures], _StepType]] = {
+    "aggregate_game_stats_multi": _aggregate_game_stats_multi,
+}
+
+
+def run_benchmark(
+    setup: Callable[[Fixtures], _StepType],
+    fixtures: Fixtures,
+    games: int,
+    max_seconds: Optional[float],
+    trace_memory: bool,
+    batch: bool = False,
+) -> Tuple[int, float, Optional[int]]:
+    """
+    Run a benchmark over `games` games, or as many as fit into `max_seconds`
+    if given. Batch benchmarks process at least the whole pool.
+
+    Returns:
+        Number of processed games, elapsed seconds and peak traced memory in
+        bytes if traced.
+    """
+    step = setup(fixtures)
+    pool_size = len(fixtures.dmp_files)
+    games_per_step = pool_size if batch else 1
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    done = 0
+    while done < games:
+        step(done % pool_size)
+        done += games_per_step
+        if (
+            max_seconds is not None
+            and done % 100 < games_per_step
+            and time.perf_counter() - start > max_seconds
+        ):
+            break
+    elapsed = time.perf_counter() - start
+    peak_memory = None
+    if trace_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return done, elapsed, peak_memory
+
+
+def compare_results(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float,
+) -> List[str]:
+    """
+    Compare results to a baseline, return descriptions of regressions.
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        base = baseline[key]
+        if result["games_per_sec"] < base["games_per_sec"] * (1 - tolerance):
+            regressions.append(
+                f"{key}: {result['games_per_sec']:.1f} games/s, "
+                f"baseline {base['games_per_sec']:.1f} games/s"
+            )
+        if (
+            result.get("peak_memory_mib") is not None
+            and base.get("peak_memory_mib") is not None
+            and result["peak_memory_mib"] > base["peak_memory_mib"] * (1 + tolerance)
+        ):
+            regressions.append(
+                f"{key}: {result['peak_memory_mib']:.2f} MiB peak, "
+                f"baseline {base['peak_memory_mib']:.2f} MiB peak"
+            )
+    return regressions
+
+
+@click.command()
+@click.option("--sizes", default="1,1000,100000", help="Comma separated game counts.")
+@click.option(
+    "--benchmark",
+    "names",
+    multiple=True,
+    type=click.Choice(list(BENCHMARKS) + list(BATCH_BENCHMARKS)),
+    help="Benchmarks to run, all by default.",
+)
+@click.option("--pool-size", default=100, help="Number of distinct games.")
+@click.option("--players", default=2, help="Number of players per game.")
+@click.option("--countable-density", default=0.2, help="Share of non-zero counts.")
+@click.option("--unknown-tags", default=4, help="Extra blocks with unknown tags.")
+@click.option(
+    "--max-seconds",
+    type=float,
+    help="Time budget per benchmark and size, runs are cut short when exceeded. "
+    "Unlimited by default.",
+)
+@click.option("--php-executable", default="php", help="PHP for statparser.php.")
+@click.option("--memory/--no-memory", default=True, help="Measure peak memory.")
+@click.option("--save", type=click.Path(dir_okay=False), help="Save results as JSON.")
+@click.option(
+    "--compare",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Fail on regressions against results saved earlier.",
+)
+@click.option("--tolerance", default=0.2, help="Allowed relative regression.")
+def main(
+    sizes: str,
+    names: Tuple[str, ...],
+    pool_size: int,
+    players: int,
+    countable_density: float,
+    unknown_tags: int,
+    max_seconds: Optional[float],
+    php_executable: str,
+    memory: bool,
+    save: Optional[str],
+    compare: Optional[str],
+    tolerance: float,
+) -> None:
+    """
+    Benchmark parsing, prettifying and aggregating synthetic games.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory() as folder:
+        fixtures = Fixtures(
+            folder,
+            pool_size,
+            players,
+            countable_density,
+            unknown_tags,
+            shutil.which(php_executable),
+        )
+        click.echo(
+            f"{'benchmark':<28}{'games':>8}{'done':>8}{'seconds':>10}"
+            f"{'games/s':>12}{'peak MiB':>10}"
+        )
+        for name in names or [*BENCHMARKS, *BATCH_BENCHMARKS]:
+            batch = name in BATCH_BENCHMARKS
+            setup = BATCH_BENCHMARKS[name] if batch else BENCHMARKS[name]
+            for games in (int(size) for size in sizes.split(",")):
+                try:
+                    done, elapsed, _ = run_benchmark(
+                        setup, fixtures, games, max_seconds, False, batch
+                    )
+                except SkippedBenchmark as e:
+                    click.echo(f"{name:<28}skipped, {e}")
+                    break
+                peak_memory_mib = None
+                if memory:
+                    # Traced separately, tracing slows the benchmark down.
+                    peak_memory = run_benchmark(
+                        setup, fixtures, done, None, True, batch
+                    )[2]
+                    peak_memory_mib = peak_memory / 2**20
+                result = {
+                    "games": done,
+                    "games_requested": games,
+                    "seconds": elapsed,
+                    "games_per_sec": done / elapsed if elapsed else float("inf"),
+                    "peak_memory_mib": peak_memory_mib,
+                }
+                results[f"{name}[{games}]"] = result
+                click.echo(
+                    f"{name:<28}{games:>8}{done:>8}{elapsed:>10.3f}"
+                    f"{result['games_per_sec']:>12.1f}"
+                    + (f"{peak_memory_mib:>10.2f}" if memory else f"{'-':>10}")
+                    + (" (time budget exceeded)" if done < games else "")
+                )
+
+    if save:
+        with open(save, "w") as file:
+            json.dump(results, file, indent=4, sort_keys=True)
+    if compare:
+        with open(compare, "r") as file:
+            regressions = compare_results(results, json.load(file), tolerance)
+        for regression in regressions:
+            click.echo("REGRESSION " + regression, err=True)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
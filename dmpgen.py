@@ -0,0 +1,184 @@
+"""
+This module generates synthetic `"stats.dmp"` files with the block layout
+decoded by `statparser`, e.g. for benchmarks.
+"""
+
+import os
+import random
+import string
+from struct import pack
+from typing import List, Optional
+
+import click
+
+import mappings
+import statparser
+
+
+MAP_NAMES = [
+    "[4] Dusk Ravine LE v1.02",
+    "[8] Proving Grounds LE v1.06",
+    "Desert Island",
+    "[2] All The Fury LE v2.02",
+    "NuclearFallout",
+]
+
+PLAYER_NAMES = ["hellbender", "BKL", "jacy", "DistanSingh", "Kane", "Tanya"]
+
+COUNTABLE_TAGS = list(mappings.HUMAN_READABLE_COUNTABLES)
+
+# Number of counts of countables with types unknown to `mappings` (e.g.
+# `"VSB"`), which are written as zeros as only zero counts can be decoded.
+UNKNOWN_TYPES_COUNT = 16
+
+
+def encode_block(tag: str, type_: int, data: bytes) -> bytes:
+    """
+    Encode a block: header, data and padding.
+
+    Args:
+        tag: Block tag of 4 ASCII chars.
+        type_: Block type, see `statparser.BlockHeader.decode_block`.
+        data: Block data.
+
+    Returns:
+        Encoded block.
+    """
+    if len(tag) != 4:
+        raise ValueError(f"Block tag should have length 4, but {tag!r} received.")
+    header = pack(">4sHH", tag.encode("ascii"), type_, len(data))
+    return header + data + b"\x00" * (-len(data) % 4)
+
+
+def _encode_ulong(tag: str, value: int) -> bytes:
+    return encode_block(tag, 6, pack(">L", value))
+
+
+def _encode_bool(tag: str, value: bool) -> bytes:
+    return encode_block(tag, 2, pack(">?", value))
+
+
+def _encode_string(tag: str, value: str) -> bytes:
+    return encode_block(tag, 7, value.encode("ascii") + b"\x00")
+
+
+def generate_stats(
+    players: int = 2,
+    countable_density: float = 0.2,
+    unknown_tags: int = 0,
+    epoch_time: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> bytes:
+    """
+    Generate contents of a `"stats.dmp"` file of a game won by one player.
+
+    Args:
+        players: Number of players, 1 to 8.
+        countable_density: Share of non-zero counts in countable blocks.
+        unknown_tags: Number of extra game blocks with tags unknown to
+            `statparser`, kept as raw base64.
+        epoch_time: Start time of the game, random if not given.
+        seed: Seed for reproducible output.
+
+    Returns:
+        Contents of a `"stats.dmp"` file.
+    """
+    if not 1 <= players <= len(statparser.PLAYER_SUFFIXES):
+        raise ValueError(
+            f"Number of players should be between 1 and "
+            f"{len(statparser.PLAYER_SUFFIXES)}, but {players} received."
+        )
+    rng = random.Random(seed)
+    if epoch_time is None:
+        epoch_time = rng.randint(1577836800, 1893456000)
+
+    blocks: List[bytes] = [
+        pack(">L", 1),
+        _encode_ulong("TIME", epoch_time),
+        _encode_string("SCEN", rng.choice(MAP_NAMES)),
+        _encode_ulong("DURA", rng.randint(60, 3600)),
+        _encode_ulong("AFPS", 60),
+        _encode_ulong("FINI", 1),
+        _encode_ulong("UNIT", 10),
+        _encode_ulong("CRED", 10000),
+        _encode_bool("SUPR", rng.random() < 0.5),
+        _encode_bool("CRAT", rng.random() < 0.5),
+        _encode_ulong("PLRS", players),
+        _encode_ulong("BAMR", rng.randrange(4)),
+        _encode_bool("SHRT", False),
+        _encode_ulong("AIPL", 0),
+        _encode_string("VERS", "1.001"),
+    ]
+    for i in range(unknown_tags):
+        # Game tags can not end with a player suffix.
+        tag = "X" + "".join(rng.choice(string.ascii_uppercase) for _ in range(3))
+        data = bytes(rng.randrange(256) for _ in range(rng.randint(1, 64)))
+        blocks.append(encode_block(tag, 20, data))
+
+    winner = rng.randrange(players)
+    for player in range(players):
+        suffix = statparser.PLAYER_SUFFIXES[player]
+        completion = 256 if player == winner else 512
+        blocks += [
+            _encode_string("NAM" + suffix, PLAYER_NAMES[player % len(PLAYER_NAMES)]),
+            _encode_ulong("CMP" + suffix, completion),
+            _encode_bool("RSG" + suffix, False),
+            _encode_bool("DED" + suffix, player != winner),
+            _encode_bool("SPC" + suffix, False),
+            _encode_bool("CON" + suffix, False),
+            _encode_ulong("CTY" + suffix, rng.choice(list(mappings.SIDES))),
+            _encode_ulong("CRD" + suffix, rng.randint(0, 20000)),
+        ]
+        for tag in COUNTABLE_TAGS:
+            if tag[:2] in mappings.COUNTABLE_TYPES:
+                counts = [
+                    rng.randint(1, 50) if rng.random() < countable_density else 0
+                    for _ in mappings.COUNTABLE_TYPES[tag[:2]]
+                ]
+            else:
+                counts = [0] * UNKNOWN_TYPES_COUNT
+            data = pack(f">{len(counts)}L", *counts)
+            blocks.append(encode_block(tag + suffix, 20, data))
+    return b"".join(blocks)
+
+
+def write_stats(filepath: str, **kwargs) -> None:
+    """
+    Generate a `"stats.dmp"` file, see `generate_stats` for arguments.
+    """
+    with open(filepath, "wb") as file:
+        file.write(generate_stats(**kwargs))
+
+
+@click.command()
+@click.argument("output_folder", type=click.Path(file_okay=False))
+@click.option("--games", default=1, help="Number of files to generate.")
+@click.option("--players", default=2, help="Number of players per game.")
+@click.option("--countable-density", default=0.2, help="Share of non-zero counts.")
+@click.option("--unknown-tags", default=0, help="Extra blocks with unknown tags.")
+@click.option("--seed", default=0, help="Seed of the first game.")
+def main(
+    output_folder: str,
+    games: int,
+    players: int,
+    countable_density: float,
+    unknown_tags: int,
+    seed: int,
+) -> None:
+    """
+    Generate synthetic stats.dmp files into OUTPUT_FOLDER.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    for i in range(games):
+        write_stats(
+            os.path.join(output_folder, f"{i}_stats.dmp"),
+            players=players,
+            countable_density=countable_density,
+            unknown_tags=unknown_tags,
+            epoch_time=1590000000 + i * 3600,
+            seed=seed + i,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+This module provides a SQLite index of the games saved by
+`statparser.process_stats`, so time range queries do not have to list every
+folder and open every `"_parsed.json"` file of the game stats folder.
+
+There is one row per game with its epoch time, map, duration and path, and one
+row per player with name, side and result.
+"""
+
+import glob
+import json
+import os
+import sqlite3
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+_GameStatsType = Dict[str, Any]
+
+# Order of precedence, e.g. a player who quit is also defeated.
+PLAYER_RESULTS = (
+    "won",
+    "draw",
+    "quit",
+    "disconnected",
+    "defeated",
+    "no_completion",
+    "spectator",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    epoch_time INTEGER PRIMARY KEY,
+    map TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    epoch_time INTEGER NOT NULL REFERENCES games (epoch_time),
+    slot INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    side TEXT,
+    result TEXT NOT NULL,
+    PRIMARY KEY (epoch_time, slot)
+);
+CREATE INDEX IF NOT EXISTS games_map ON games (map, epoch_time);
+CREATE INDEX IF NOT EXISTS players_name ON players (name, epoch_time);
+"""
+
+
+class IndexedGame(NamedTuple):
+    epoch_time: int
+    map: str
+    duration: int
+    path: str
+
+
+def player_result(stats: Dict[str, Any]) -> str:
+    """
+    Result of a player from prettified stats, see `PLAYER_RESULTS`.
+    """
+    for result in PLAYER_RESULTS:
+        if stats.get(result):
+            return result
+    return "unknown"
+
+
+def _time_range_conditions(
+    column: str, since: Optional[int], until: Optional[int]
+) -> Tuple[List[str], List[Any]]:
+    conditions: List[str] = []
+    parameters: List[Any] = []
+    if since is not None:
+        conditions.append(f"{column} > ?")
+        parameters.append(since)
+    if until is not None:
+        conditions.append(f"{column} <= ?")
+        parameters.append(until)
+    return conditions, parameters
+
+
+class GameIndex:
+    """
+    Class for a SQLite index of games. There is one game per epoch time,
+    adding a game with a known epoch time replaces it.
+    """
+
+    def __init__(self, filepath: str) -> None:
+        self.filepath = filepath
+        folder = os.path.dirname(os.path.abspath(filepath))
+        os.makedirs(folder, exist_ok=True)
+        # The stat watcher adds games from its observer thread.
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> "GameIndex":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _insert(self, stats: _GameStatsType, path: str) -> None:
+        report = stats["gameReport"]
+        epoch_time = report["epoch_time"]
+        players_stats = stats["playerStats"]
+        if isinstance(players_stats, dict):
+            players_stats = list(players_stats.values())
+        self._connection.execute(
+            "INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?)",
+            (epoch_time, report["map"], report["duration"], path),
+        )
+        self._connection.execute(
+            "DELETE FROM players WHERE epoch_time = ?", (epoch_time,)
+        )
+        self._connection.executemany(
+            "INSERT INTO players VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    epoch_time,
+                    slot,
+                    player["name"],
+                    player.get("side"),
+                    player_result(player),
+                )
+                for slot, player in enumerate(players_stats)
+            ],
+        )
+
+    def add_game(self, stats: _GameStatsType, path: str) -> None:
+        """
+        Add a game.
+
+        Args:
+            stats: Prettified stats of the game.
+            path: Path to the prettified stats in JSON format.
+        """
+        with self._connection:
+            self._insert(stats, path)
+
+    def add_games(
+        self, games: Iterable[Tuple[_GameStatsType, str]], replace: bool = False
+    ) -> int:
+        """
+        Add games in a single transaction, see `add_game` for the tuples.
+
+        Args:
+            games: Tuples of prettified stats and path.
+            replace: Remove all other games.
+
+        Returns:
+            Number of added games.
+        """
+        n = 0
+        with self._connection:
+            if replace:
+                self._connection.execute("DELETE FROM players")
+                self._connection.execute("DELETE FROM games")
+            for stats, path in games:
+                self._insert(stats, path)
+                n += 1
+        return n
+
+    def iter_games(
+        self,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        names: Optional[Collection[str]] = None,
+        side: Optional[str] = None,
+        result: Optional[str] = None,
+        map_: Optional[str] = None,
+        min_duration: Optional[int] = None,
+        max_duration: Optional[int] = None,
+        resolve_name: Optional[Callable[[str], str]] = None,
+    ) -> Iterator[IndexedGame]:
+        """
+        Iterate over indexed games in time order. All filters are evaluated by
+        SQLite, player filters on the same player.
+
+        Args:
+            since: Only games started after this epoch time.
+            until: Only games started at or before this epoch time.
+            names: Only games with a player of one of these names.
+            side: Only games with a player of this side.
+            result: Only games with a player of this result, see
+                `PLAYER_RESULTS`.
+            map_: Only games on this map.
+            min_duration: Only games lasting at least this many seconds.
+            max_duration: Only games lasting at most this many seconds.
+            resolve_name: Function resolving aliases of player names, `names`
+                are then matched against resolved names.
+
+        Yields:
+            Indexed games.
+        """
+        query = "SELECT epoch_time, map, duration, path FROM games"
+        conditions, parameters = _time_range_conditions("epoch_time", since, until)
+        if map_ is not None:
+            conditions.append("map = ?")
+            parameters.append(map_)
+        if min_duration is not None:
+            conditions.append("duration >= ?")
+            parameters.append(min_duration)
+        if max_duration is not None:
+            conditions.append("duration <= ?")
+            parameters.append(max_duration)
+        player_conditions: List[str] = []
+        if names is not None:
+            names = list(names)
+            if resolve_name is not None:
+                # Resolved once per distinct name, the filter stays a lookup
+                # on the players_name index.
+                resolved_names = set(names)
+                names = [
+                    name
+                    for name in self.player_names()
+                    if resolve_name(name) in resolved_names
+                ]
+            player_conditions.append(f"name IN ({', '.join('?' * len(names))})")
+            parameters.extend(names)
+        if side is not None:
+            player_conditions.append("side = ?")
+            parameters.append(side)
+        if result is not None:
+            player_conditions.append("result = ?")
+            parameters.append(result)
+        if player_conditions:
+            conditions.append(
+                "epoch_time IN (SELECT epoch_time FROM players WHERE "
+                + " AND ".join(player_conditions)
+                + ")"
+            )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY epoch_time"
+        for row in self._connection.execute(query, parameters):
+            yield IndexedGame(*row)
+
+    def iter_player_rows(
+        self, since: Optional[int] = None, until: Optional[int] = None
+    ) -> Iterator[Tuple[int, str, int, str, Optional[str], str]]:
+        """
+        Iterate over players of indexed games in time order, see `iter_games`
+        for arguments.
+
+        Yields:
+            Tuples of epoch time, map and duration of the game and name, side
+            and result of the player.
+        """
+        query = (
+            "SELECT games.epoch_time, map, duration, name, side, result"
+            " FROM games JOIN players ON players.epoch_time = games.epoch_time"
+        )
+        conditions, parameters = _time_range_conditions(
+            "games.epoch_time", since, until
+        )
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY games.epoch_time, slot"
+        yield from self._connection.execute(query, parameters)
+
+    def player_names(self) -> List[str]:
+        """
+        Distinct names of the players of indexed games.
+        """
+        return [
+            row[0]
+            for row in self._connection.execute("SELECT DISTINCT name FROM players")
+        ]
+
+    def paths(
+        self, since: Optional[int] = None, until: Optional[int] = None
+    ) -> List[str]:
+        """
+        Paths of the indexed games in time order, see `iter_games` for arguments.
+        """
+        return [game.path for game in self.iter_games(since, until)]
+
+
+def read_parsed_game(path: str) -> _GameStatsType:
+    """
+    Read prettified stats saved by `statparser.process_stats`.
+    """
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def backfill(index: GameIndex, game_stats_folder: str, replace: bool = False) -> int:
+    """
+    Add all games saved in a game stats folder to an index.
+
+    Args:
+        index: Index to add to.
+        game_stats_folder: Output folder of `statparser.process_stats`.
+        replace: Remove games not in the folder from the index.
+
+    Returns:
+        Number of added games.
+    """
+    parsed_files = glob.glob(
+        os.path.join(glob.escape(game_stats_folder), "**", "*_parsed.json"),
+        recursive=True,
+    )
+
+    def games() -> Iterator[Tuple[_GameStatsType, str]]:
+        for path in parsed_files:
+            try:
+                stats = read_parsed_game(path)
+            except (OSError, ValueError):
+                # Same as aggregation, which skips files it can not parse.
+                continue
+            yield stats, path
+
+    return index.add_games(games(), replace)
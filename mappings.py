@@ -643,3 +643,9 @@ COUNTABLE_TYPES: Dict[str, List[str]] = {
         "CALUNR02",
     ],
 }
+
+# Index of each type name in `COUNTABLE_TYPES`, by prefix.
+COUNTABLE_TYPE_INDEXES: Dict[str, Dict[str, int]] = {
+    prefix: {type_: i for i, type_ in enumerate(types)}
+    for prefix, types in COUNTABLE_TYPES.items()
+}
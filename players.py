@@ -0,0 +1,95 @@
+"""
+This module provides a registry of player identities, mapping every alias of a
+player to a canonical name.
+
+Aliases are matched case-insensitively with runs of whitespace collapsed,
+after stripping clan tags, e.g. `"[GDI] Hell  Bender"` matches the alias
+`"hell bender"`. The registry is built once from the `playerAliases` of the
+configuration, so resolving a name is a dictionary lookup instead of a scan of
+all alias lists.
+"""
+
+import re
+from typing import Dict, Iterable, Sequence
+
+
+def normalize_name(name: str) -> str:
+    """
+    Case-folded name with runs of whitespace collapsed to single spaces.
+    """
+    return " ".join(name.split()).casefold()
+
+
+class PlayerRegistry:
+    """
+    Class for resolving player names to canonical names, the first name of
+    their alias list. Names without aliases resolve to themselves, stripped of
+    clan tags. A name in several alias lists belongs to the first one, as
+    later lists can not take over a known alias.
+    """
+
+    def __init__(
+        self,
+        player_aliases: Iterable[Sequence[str]] = (),
+        clan_tag_patterns: Iterable[str] = (),
+    ) -> None:
+        """
+        Args:
+            player_aliases: Lists of names of the same player, canonical name
+                first.
+            clan_tag_patterns: Regular expressions of clan tags to remove from
+                names, e.g. `r"^\\[\\w+\\]"`.
+        """
+        self._clan_tag_patterns = [re.compile(pattern) for pattern in clan_tag_patterns]
+        # Normalized alias to canonical name.
+        self._canonical_names: Dict[str, str] = {}
+        # Resolved names by raw name, names repeat in every game.
+        self._resolved: Dict[str, str] = {}
+        for aliases in player_aliases:
+            self.add_aliases(aliases)
+
+    def strip_clan_tags(self, name: str) -> str:
+        for pattern in self._clan_tag_patterns:
+            name = pattern.sub("", name)
+        return name.strip()
+
+    def key(self, name: str) -> str:
+        """
+        Normalized name without clan tags, which aliases are matched by.
+        """
+        return normalize_name(self.strip_clan_tags(name))
+
+    def add_aliases(self, aliases: Sequence[str]) -> str:
+        """
+        Add a list of names of the same player. Names which already belong to
+        a player are skipped, if the first name is one of them the other names
+        are added to its player.
+
+        Args:
+            aliases: Names of the player, canonical name first.
+
+        Returns:
+            Canonical name of the player.
+        """
+        if not aliases:
+            raise ValueError("Aliases should have at least one name.")
+        canonical_name = self._canonical_names.get(self.key(aliases[0]), aliases[0])
+        for name in aliases:
+            key = self.key(name)
+            if key not in self._canonical_names:
+                self._canonical_names[key] = canonical_name
+        self._resolved.clear()
+        return canonical_name
+
+    def resolve(self, name: str) -> str:
+        """
+        Canonical name of a player.
+        """
+        resolved = self._resolved.get(name)
+        if resolved is None:
+            stripped_name = self.strip_clan_tags(name)
+            resolved = self._canonical_names.get(
+                normalize_name(stripped_name), stripped_name
+            )
+            self._resolved[name] = resolved
+        return resolved
@@ -0,0 +1,221 @@
+"""
+This module provides compact record types for prettified game stats, as saved
+by `statparser.process_stats`.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import mappings
+import statparser
+
+
+_CountsType = Union[statparser.Countables, Dict[str, int]]
+
+HEAPS: Tuple[str, ...] = tuple(mappings.HUMAN_READABLE_COUNTABLES.values())
+
+_HEAP_PREFIXES: Dict[str, str] = {
+    heap: tag[:2] for tag, heap in mappings.HUMAN_READABLE_COUNTABLES.items()
+}
+
+
+def _to_countables(heap: str, counts: Dict[str, int]) -> _CountsType:
+    """
+    Convert detailed counts of a heap to `statparser.Countables`. Counts which
+    can not be aligned to `mappings.COUNTABLE_TYPES` are kept as dict.
+    """
+    prefix = _HEAP_PREFIXES.get(heap)
+    if (
+        statparser.numpy is None
+        or prefix not in mappings.COUNTABLE_TYPES
+        or not isinstance(counts, dict)
+    ):
+        return counts
+    try:
+        return statparser.Countables.from_dict(prefix, counts)
+    except ValueError:
+        # Type name unknown to `mappings`, e.g. from an old statparser.php.
+        return counts
+
+
+def count_total(counts: _CountsType) -> int:
+    """
+    Sum of detailed counts of a heap.
+    """
+    if isinstance(counts, statparser.Countables):
+        return counts.total()
+    return sum(counts.values(), 0)
+
+
+class PlayerRecord:
+    """
+    Class for storing prettified stats of a player. Fields missing from the
+    stats are `None`, per heap totals are derived from `detailed_counts`.
+    """
+
+    FIELDS: Tuple[str, ...] = (
+        "name",
+        "side",
+        "funds_left",
+        "won",
+        "defeated",
+        "draw",
+        "quit",
+        "disconnected",
+        "no_completion",
+        "spectator",
+    )
+
+    __slots__ = FIELDS + ("detailed_counts", "raw", "extra")
+
+    def __init__(self, **fields: Any) -> None:
+        for field in self.FIELDS:
+            setattr(self, field, fields.get(field))
+        self.detailed_counts: Optional[Dict[str, _CountsType]] = fields.get(
+            "detailed_counts"
+        )
+        self.raw: Optional[Dict[str, Any]] = fields.get("raw")
+        self.extra: Dict[str, Any] = fields.get("extra", {})
+
+    def __repr__(self) -> str:
+        return f"PlayerRecord(name={self.name!r}, side={self.side!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PlayerRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def total(self, heap: str) -> Optional[int]:
+        """
+        Total count of a heap, e.g. `"units_built"`, `None` if not counted.
+        """
+        if heap in self.extra:
+            return self.extra[heap]
+        if self.detailed_counts is None or heap not in self.detailed_counts:
+            return None
+        return count_total(self.detailed_counts[heap])
+
+    @classmethod
+    def from_dict(cls, stats: Dict[str, Any]) -> "PlayerRecord":
+        """
+        Create a record from prettified stats of a player.
+        """
+        stats = dict(stats)
+        fields = {field: stats.pop(field, None) for field in cls.FIELDS}
+        fields["raw"] = stats.pop("raw", None)
+        detailed_counts = stats.pop("detailed_counts", None)
+        if detailed_counts is not None:
+            detailed_counts = {
+                heap: _to_countables(heap, counts)
+                for heap, counts in detailed_counts.items()
+            }
+            for heap, counts in detailed_counts.items():
+                if stats.get(heap) == count_total(counts):
+                    del stats[heap]
+        fields["detailed_counts"] = detailed_counts
+        # Anything else, including totals not matching detailed counts.
+        fields["extra"] = stats
+        return cls(**fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the record back to prettified stats of a player.
+        """
+        stats: Dict[str, Any] = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                stats[field] = value
+        if self.detailed_counts is not None:
+            stats["detailed_counts"] = {}
+            for heap, counts in self.detailed_counts.items():
+                stats[heap] = count_total(counts)
+                if isinstance(counts, statparser.Countables):
+                    counts = counts.as_dict()
+                stats["detailed_counts"][heap] = counts
+        if self.raw is not None:
+            stats["raw"] = self.raw
+        stats.update(self.extra)
+        return stats
+
+
+class GameRecord:
+    """
+    Class for storing prettified stats of a game and its players.
+    """
+
+    __slots__ = (
+        "epoch_time",
+        "map",
+        "duration",
+        "result",
+        "players",
+        "report",
+        "extra",
+    )
+
+    def __init__(
+        self,
+        epoch_time: int,
+        map_: str,
+        duration: int,
+        result: str,
+        players: List[PlayerRecord],
+        report: Optional[Dict[str, Any]] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.epoch_time = epoch_time
+        self.map = map_
+        self.duration = duration
+        self.result = result
+        self.players = players
+        self.report: Dict[str, Any] = report if report is not None else {}
+        self.extra: Dict[str, Any] = extra if extra is not None else {}
+
+    def __repr__(self) -> str:
+        return (
+            f"GameRecord(epoch_time={self.epoch_time}, map={self.map!r}, "
+            f"players={self.players!r})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, GameRecord):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GameRecord":
+        """
+        Create a record from prettified stats of a game. Player stats saved as
+        dict (by older statparser.php versions) are accepted as well.
+        """
+        data = dict(data)
+        report = dict(data.pop("gameReport"))
+        players_stats = data.pop("playerStats")
+        if isinstance(players_stats, dict):
+            players_stats = list(players_stats.values())
+        return cls(
+            report.pop("epoch_time"),
+            report.pop("map"),
+            report.pop("duration"),
+            data.pop("gameResult", "unknown"),
+            [PlayerRecord.from_dict(stats) for stats in players_stats],
+            report,
+            data,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the record back to prettified stats of a game.
+        """
+        report = {
+            "epoch_time": self.epoch_time,
+            "map": self.map,
+            "duration": self.duration,
+            **self.report,
+        }
+        return {
+            "gameReport": report,
+            "playerStats": [player.to_dict() for player in self.players],
+            "gameResult": self.result,
+            **self.extra,
+        }
@@ -3,23 +3,61 @@ This module provides functions for parsing and prettifying `"stats.dmp"` file.
 """
 
 import base64
+import hashlib
 import json
+import mmap
 import os
 import re
 import shutil
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
-from struct import unpack
-from typing import Dict, List, Union
+from functools import lru_cache
+from struct import Struct, unpack
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Collection,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import mappings
 
+if TYPE_CHECKING:
+    # Only for annotations, gameindex indexes what this module writes.
+    import gameindex
+
+try:
+    import numpy
+except ImportError:  # Only needed for decoding countables to arrays.
+    numpy = None
+
 
 PLAYER_SUFFIXES = "01234567"
 
 
-_DecodedBlockType = Union[bool, int, str, Dict[str, int]]
+_DecodedBlockType = Union[bool, int, str, Dict[str, int], "Countables"]
 _PrettifiedStatsType = Dict[str, Union[_DecodedBlockType, Dict[str, _DecodedBlockType]]]
+_GameStatsType = Dict[str, Union[str, _PrettifiedStatsType, List[_PrettifiedStatsType]]]
+_BufferType = Union[bytes, bytearray, memoryview, mmap.mmap]
+_TagHandlerType = Callable[[_PrettifiedStatsType, _DecodedBlockType], None]
+
+_FILE_HEADER_LENGTH = 4
+_BLOCK_HEADER_STRUCT = Struct(">4sHH")
+_SCALAR_STRUCTS: Dict[int, Struct] = {
+    1: Struct(">c"),  # A single byte.
+    2: Struct(">?"),  # A single boolean.
+    3: Struct(">h"),  # A single short.
+    4: Struct(">H"),  # A single unsigned short.
+    5: Struct(">l"),  # A single long.
+    6: Struct(">L"),  # A single unsigned long.
+}
 
 
 def bytes_to_ascii(binary_blob: bytes) -> str:
@@ -132,9 +170,389 @@ class BlockHeader:
         raise ValueError(f"Decoding rule for type {self.type} is unknown.")
 
 
-def parse_stats(filepath: str) -> Dict[str, _DecodedBlockType]:
+class Countables:
+    """
+    Class for storing counts of a countable block (e.g. `"UNB"`) as a vector
+    aligned to `mappings.COUNTABLE_TYPES[prefix]`. Requires `numpy`.
+    """
+
+    __slots__ = ("prefix", "counts")
+
+    def __init__(self, prefix: str, counts: "numpy.ndarray") -> None:
+        self.prefix = prefix
+        self.counts = counts
+
+    def __repr__(self) -> str:
+        return f"Countables({self.prefix!r}, {self.as_dict()!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Countables):
+            return NotImplemented
+        return self.prefix == other.prefix and numpy.array_equal(
+            self.counts, other.counts
+        )
+
+    def __add__(self, other: "Countables") -> "Countables":
+        return Countables(self.prefix, self.counts + other.counts)
+
+    def __iadd__(self, other: "Countables") -> "Countables":
+        self.counts += other.counts
+        return self
+
+    @classmethod
+    def zeros(cls, prefix: str) -> "Countables":
+        """
+        Create zero counts for all types of `prefix`, none if its types are
+        unknown (e.g. `"VS"`).
+        """
+        if numpy is None:
+            raise ImportError("numpy is required for decoding countables to arrays.")
+        return cls(
+            prefix,
+            numpy.zeros(len(mappings.COUNTABLE_TYPES.get(prefix, ())), numpy.int64),
+        )
+
+    @classmethod
+    def from_dict(cls, prefix: str, counts: Dict[str, int]) -> "Countables":
+        """
+        Create counts from a dict as produced by `BlockHeader.decode_block`.
+        Raises `ValueError` for type names unknown to `mappings`, see
+        `can_align`.
+        """
+        countables = cls.zeros(prefix)
+        indexes = mappings.COUNTABLE_TYPE_INDEXES.get(prefix, {})
+        try:
+            countables.counts[[indexes[type_] for type_ in counts]] = list(
+                counts.values()
+            )
+        except KeyError as e:
+            raise ValueError(f"Type {e.args[0]!r} is unknown for {prefix}.") from None
+        return countables
+
+    @staticmethod
+    def can_align(prefix: str, counts: Dict[str, int]) -> bool:
+        """
+        Whether all type names of `counts` are known for `prefix`, so
+        `from_dict` succeeds.
+        """
+        indexes = mappings.COUNTABLE_TYPE_INDEXES.get(prefix, {})
+        return all(type_ in indexes for type_ in counts)
+
+    @classmethod
+    def from_buffer(
+        cls, prefix: str, buffer: _BufferType, offset: int, count: int
+    ) -> "Countables":
+        """
+        Decode `count` big-endian unsigned longs. Data is copied, so `buffer`
+        may be closed afterwards. Counts beyond the known types are dropped if
+        zero, same as `BlockHeader.decode_block`.
+        """
+        countables = cls.zeros(prefix)
+        counts = numpy.frombuffer(buffer, dtype=">u4", count=count, offset=offset)
+        known = len(countables.counts)
+        if counts[known:].any():
+            raise IndexError(
+                f"Non-zero counts received beyond the {known} types known "
+                f"for {prefix}."
+            )
+        countables.counts[: min(count, known)] = counts[:known]
+        return countables
+
+    def total(self) -> int:
+        """
+        Sum of counts of all types.
+        """
+        return int(self.counts.sum())
+
+    def as_dict(self) -> Dict[str, int]:
+        """
+        Non-zero counts by type name, same as `BlockHeader.decode_block`.
+        """
+        types = mappings.COUNTABLE_TYPES.get(self.prefix, ())
+        return {types[i]: int(self.counts[i]) for i in numpy.flatnonzero(self.counts)}
+
+
+@lru_cache(maxsize=None)
+def _decode_tag(binary_tag: bytes) -> str:
+    """
+    Decode a block tag. The same few hundred tags repeat in every file, so
+    results are cached.
+    """
+    return bytes_to_ascii(binary_tag)
+
+
+@lru_cache(maxsize=None)
+def _counts_struct(count: int) -> Struct:
+    """
+    Precompiled struct for a block of `count` unsigned longs.
+    """
+    return Struct(f">{count}L")
+
+
+def _walk_blocks(buffer: _BufferType) -> Iterator[Tuple[str, int, int, int]]:
+    """
+    Walk the blocks of a `"stats.dmp"` buffer without copying block data.
+
+    Args:
+        buffer: Contents of a `"stats.dmp"` file.
+
+    Yields:
+        Tuples of block tag, block type, data offset and data length.
+    """
+    size = len(buffer)
+    if size < _FILE_HEADER_LENGTH:
+        raise ValueError(
+            f"File header should have length {_FILE_HEADER_LENGTH}, but binary "
+            f"blob of length {size} received."
+        )
+    header_length = _BLOCK_HEADER_STRUCT.size
+    unpack_header = _BLOCK_HEADER_STRUCT.unpack_from
+    offset = _FILE_HEADER_LENGTH
+    while offset < size:
+        if size - offset < header_length:
+            raise ValueError(
+                f"Block header should have length {header_length}, "
+                f"but binary blob of length {size - offset} received."
+            )
+        binary_tag, type_, length = unpack_header(buffer, offset)
+        offset += header_length
+        if size - offset < length:
+            raise ValueError(
+                f"Block data should have length {length}, "
+                f"but binary blob of length {size - offset} received."
+            )
+        yield _decode_tag(binary_tag), type_, offset, length
+        # Skip block data and padding.
+        offset += length + -length % 4
+
+
+def _decode_block_at(
+    tag: str,
+    type_: int,
+    buffer: _BufferType,
+    offset: int,
+    length: int,
+    countables_as_arrays: bool = False,
+) -> _DecodedBlockType:
+    """
+    Decode block data in place, same rules as `BlockHeader.decode_block`.
+    Countables are decoded to `Countables` if `countables_as_arrays` is set.
+    """
+    scalar_struct = _SCALAR_STRUCTS.get(type_)
+    if scalar_struct is not None:
+        if length != scalar_struct.size:
+            raise ValueError(
+                f"Block data of type {type_} should have length "
+                f"{scalar_struct.size}, but {length} received."
+            )
+        return scalar_struct.unpack_from(buffer, offset)[0]
+    if type_ == 7:
+        # Multiple b"\x00"-terminated chars.
+        return bytes_to_ascii(bytes(buffer[offset : offset + length]).rstrip(b"\x00"))
+    if type_ == 20:
+        # Custom type and length.
+        if tag[:3] in mappings.HUMAN_READABLE_COUNTABLES:
+            # Multiple unsigned longs.
+            if length % 4:
+                raise ValueError(
+                    f"Length of block data should be multiple of 4, "
+                    f"but {length} received."
+                )
+            if countables_as_arrays:
+                return Countables.from_buffer(tag[:2], buffer, offset, length // 4)
+            counts = _counts_struct(length // 4).unpack_from(buffer, offset)
+            # Types are only looked up for non-zero counts, e.g. "VS" blocks
+            # have no known types but are all zero.
+            return {
+                mappings.COUNTABLE_TYPES[tag[:2]][i]: count
+                for i, count in enumerate(counts)
+                if count > 0
+            }
+        # Raw bytes.
+        # Bytes are not json serializable, so encode them as base64.
+        return base64.b64encode(buffer[offset : offset + length]).decode("ascii")
+    raise ValueError(f"Decoding rule for type {type_} is unknown.")
+
+
+@contextmanager
+def _map_file(filepath: str) -> Iterator[_BufferType]:
+    """
+    Memory-map a file for reading.
+    """
+    with open(filepath, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            # Empty files can not be memory-mapped.
+            yield b""
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def parse_stats_buffer(
+    buffer: _BufferType, countables_as_arrays: bool = False
+) -> Dict[str, _DecodedBlockType]:
     """
-    Parse a `"stats.dmp"` file to dict.
+    Parse contents of a `"stats.dmp"` file to dict.
+
+    Args:
+        buffer: Contents of a `"stats.dmp"` file, e.g. `bytes`, `memoryview`
+            or `mmap.mmap`.
+        countables_as_arrays: Decode countables to `Countables` vectors instead
+            of dicts.
+
+    Returns:
+        Parsed statistics.
+    """
+    return {
+        tag: _decode_block_at(tag, type_, buffer, offset, length, countables_as_arrays)
+        for tag, type_, offset, length in _walk_blocks(buffer)
+    }
+
+
+def parse_stats(
+    filepath: str, countables_as_arrays: bool = False
+) -> Dict[str, _DecodedBlockType]:
+    """
+    Parse a `"stats.dmp"` file to dict. The file is memory-mapped and decoded
+    in place.
+
+    Args:
+        filepath: Path to a `"stats.dmp"` file.
+        countables_as_arrays: Decode countables to `Countables` vectors instead
+            of dicts.
+
+    Returns:
+        Parsed statistics.
+    """
+    with _map_file(filepath) as buffer:
+        return parse_stats_buffer(buffer, countables_as_arrays)
+
+
+class Block:
+    """
+    Class for a block located in a `"stats.dmp"` buffer. Block data is decoded
+    on first access to `value`.
+    """
+
+    __slots__ = ("tag", "type", "offset", "length", "_buffer", "_value")
+
+    def __init__(
+        self, tag: str, type_: int, offset: int, length: int, buffer: _BufferType
+    ) -> None:
+        self.tag = tag
+        self.type = type_
+        self.offset = offset
+        self.length = length
+        self._buffer: Optional[_BufferType] = buffer
+        self._value: Optional[_DecodedBlockType] = None
+
+    def __repr__(self) -> str:
+        return (
+            f"Block(tag={self.tag!r}, type={self.type}, "
+            f"offset={self.offset}, length={self.length})"
+        )
+
+    @property
+    def value(self) -> _DecodedBlockType:
+        """
+        Decoded block data.
+        """
+        if self._buffer is not None:
+            self._value = _decode_block_at(
+                self.tag, self.type, self._buffer, self.offset, self.length
+            )
+            self._buffer = None
+        return self._value
+
+
+def player_tags(*tags: str) -> FrozenSet[str]:
+    """
+    Expand player tags without suffix to the tags of all players, e.g.
+    `player_tags("NAM")` gives `{"NAM0", ..., "NAM7"}`.
+    """
+    return frozenset(tag + suffix for tag in tags for suffix in PLAYER_SUFFIXES)
+
+
+_FINGERPRINT_TAGS = frozenset({"TIME"}) | player_tags("NAM")
+
+
+def iter_buffer_blocks(
+    buffer: _BufferType, tags: Optional[Collection[str]] = None
+) -> Iterator[Block]:
+    """
+    Iterate over blocks of a `"stats.dmp"` buffer without decoding them.
+
+    Args:
+        buffer: Contents of a `"stats.dmp"` file.
+        tags: Tags to yield, all blocks are yielded if not given.
+
+    Yields:
+        Blocks in file order.
+    """
+    if tags is not None:
+        tags = frozenset(tags)
+    for tag, type_, offset, length in _walk_blocks(buffer):
+        if tags is None or tag in tags:
+            yield Block(tag, type_, offset, length, buffer)
+
+
+def iter_blocks(
+    filepath: str, tags: Optional[Collection[str]] = None
+) -> Iterator[Block]:
+    """
+    Iterate over blocks of a `"stats.dmp"` file without decoding them. The file
+    stays memory-mapped until the iterator is exhausted or closed, so `value`
+    of a block has to be accessed before that.
+
+    Args:
+        filepath: Path to a `"stats.dmp"` file.
+        tags: Tags to yield, all blocks are yielded if not given.
+
+    Yields:
+        Blocks in file order.
+    """
+    with _map_file(filepath) as buffer:
+        yield from iter_buffer_blocks(buffer, tags)
+
+
+def read_tags(filepath: str, tags: Collection[str]) -> Dict[str, _DecodedBlockType]:
+    """
+    Parse only the given tags of a `"stats.dmp"` file, other blocks are skipped
+    without decoding.
+
+    Args:
+        filepath: Path to a `"stats.dmp"` file.
+        tags: Tags to parse.
+
+    Returns:
+        Parsed statistics of the found tags.
+    """
+    return {block.tag: block.value for block in iter_blocks(filepath, tags)}
+
+
+def fingerprint_stats(filepath: str) -> str:
+    """
+    Fingerprint of the game in a `"stats.dmp"` file. Only the start time and
+    player names are read, so rewrites of the same game's file give the same
+    fingerprint.
+
+    Args:
+        filepath: Path to a `"stats.dmp"` file.
+
+    Returns:
+        Hex digest identifying the game.
+    """
+    tags = read_tags(filepath, _FINGERPRINT_TAGS)
+    if "TIME" not in tags:
+        raise ValueError(f'No "TIME" block found in "{filepath}".')
+    content = json.dumps(tags, sort_keys=True)
+    return hashlib.sha1(content.encode("ascii")).hexdigest()
+
+
+def parse_stats_legacy(filepath: str) -> Dict[str, _DecodedBlockType]:
+    """
+    Parse a `"stats.dmp"` file to dict, reading and decoding it block by block.
+    Kept for comparison with `parse_stats`.
 
     Args:
         filepath: Path to a `"stats.dmp"` file.
@@ -195,7 +613,10 @@ def prettify_player_stats(
             stats["funds_left"] = value
         elif tag in mappings.HUMAN_READABLE_COUNTABLES:
             human_readable_tag = mappings.HUMAN_READABLE_COUNTABLES[tag]
-            stats[human_readable_tag] = sum(value.values(), 0)
+            if isinstance(value, Countables):
+                stats[human_readable_tag] = value.total()
+            else:
+                stats[human_readable_tag] = sum(value.values(), 0)
             detailed_counts[human_readable_tag] = value
         else:
             raw[tag] = value
@@ -249,24 +670,151 @@ def prettify_game_stats(
     return stats
 
 
-def process_stats(stats_file: str, output_folder: str, reporter_name: str) -> str:
+def _set(
+    key: str, convert: Optional[Callable[[_DecodedBlockType], _DecodedBlockType]] = None
+) -> _TagHandlerType:
+    """
+    Tag handler storing the block value, optionally converted, under `key`.
+    """
+    if convert is None:
+
+        def handler(stats: _PrettifiedStatsType, value: _DecodedBlockType) -> None:
+            stats[key] = value
+
+    else:
+
+        def handler(stats: _PrettifiedStatsType, value: _DecodedBlockType) -> None:
+            stats[key] = convert(value)
+
+    return handler
+
+
+def _set_countable(human_readable_tag: str) -> _TagHandlerType:
+    """
+    Tag handler storing total and detailed counts of a countable.
     """
-    Backup, parse and prettify a `"stats.dmp"` file.
+
+    def handler(stats: _PrettifiedStatsType, value: _DecodedBlockType) -> None:
+        if isinstance(value, Countables):
+            stats[human_readable_tag] = value.total()
+        else:
+            stats[human_readable_tag] = sum(value.values(), 0)
+        stats["detailed_counts"][human_readable_tag] = value
+
+    return handler
+
+
+def _set_completion(stats: _PrettifiedStatsType, value: _DecodedBlockType) -> None:
+    for code, status in mappings.COMPLETION_CODES.items():
+        stats[status] = bool(value & code)
+
+
+def _set_bamr(stats: _PrettifiedStatsType, value: _DecodedBlockType) -> None:
+    stats["mcv_repacks"] = bool(value & 1)
+    stats["build_off_ally_conyards"] = bool(value & 2)
+
+
+# Same rules as `prettify_player_stats` and `prettify_game_stats`. Tags
+# without a handler are kept in "raw".
+_PLAYER_TAG_HANDLERS: Dict[str, _TagHandlerType] = {
+    "CMP": _set_completion,
+    "RSG": _set("quit"),
+    "DED": _set("defeated"),
+    "SPC": _set("spectator"),
+    "LCN": _set("disconnected"),
+    "CON": _set("disconnected"),
+    "CTY": _set("side", mappings.SIDES.__getitem__),
+    "NAM": _set("name"),
+    "CRD": _set("funds_left"),
+    **{
+        tag: _set_countable(human_readable_tag)
+        for tag, human_readable_tag in mappings.HUMAN_READABLE_COUNTABLES.items()
+    },
+}
+_GAME_TAG_HANDLERS: Dict[str, _TagHandlerType] = {
+    "DURA": _set("duration"),
+    "AFPS": _set("fps"),
+    "FINI": _set("finished"),
+    "TIME": _set("epoch_time"),
+    "SCEN": _set("map"),
+    "UNIT": _set("starting_units"),
+    "CRED": _set("starting_credits"),
+    "SUPR": _set("superweapons", bool),
+    "CRAT": _set("crates", bool),
+    "PLRS": _set("players_in_game"),
+    "BAMR": _set_bamr,
+    "SHRT": _set("short_game", bool),
+    "AIPL": _set("ai_players"),
+    "VERS": _set("game_version"),
+}
+
+
+def _game_result(players_stats: List[_PrettifiedStatsType], reporter_name: str) -> str:
+    """
+    Game status of the player named `reporter_name`.
+    """
+    for player_stats in players_stats:
+        if player_stats["name"] == reporter_name:
+            for status in mappings.COMPLETION_CODES.values():
+                if player_stats[status] is True:
+                    return status
+    return "unknown"
+
+
+def prettify_stats(
+    raw_stats: Dict[str, _DecodedBlockType], reporter_name: str
+) -> _GameStatsType:
+    """
+    Prettify stats of a game and its players. Every block is routed to its
+    player or to the game in a single pass over `raw_stats`.
 
     Args:
-        stats_file: `"stats.dmp"` file.
-        output_folder: Backup folder.
+        raw_stats: Parsed statistics.
         reporter_name: Name of the current player to parse the game status from.
 
     Returns:
-        Path to the prettified stats in JSON format.
+        Prettified stats.
     """
-    if not os.path.isfile(stats_file):
-        raise FileNotFoundError(
-            f'Given path "{stats_file}" does not exist or is not a file.'
-        )
+    players: Dict[str, _PrettifiedStatsType] = {}
+    game_stats: _PrettifiedStatsType = {"raw": {}}
+    for tag, value in raw_stats.items():
+        suffix = tag[-1]
+        if suffix in PLAYER_SUFFIXES:
+            stats = players.get(suffix)
+            if stats is None:
+                stats = players[suffix] = {"raw": {}, "detailed_counts": {}}
+            tag = tag[:-1]
+            handler = _PLAYER_TAG_HANDLERS.get(tag)
+        else:
+            stats = game_stats
+            handler = _GAME_TAG_HANDLERS.get(tag)
+        if handler is None:
+            stats["raw"][tag] = value
+        else:
+            handler(stats, value)
+    players_stats = [players[suffix] for suffix in PLAYER_SUFFIXES if suffix in players]
 
-    raw_stats = parse_stats(stats_file)
+    return {
+        "gameReport": game_stats,
+        "playerStats": players_stats,
+        "gameResult": _game_result(players_stats, reporter_name),
+    }
+
+
+def prettify_stats_legacy(
+    raw_stats: Dict[str, _DecodedBlockType], reporter_name: str
+) -> _GameStatsType:
+    """
+    Prettify stats of a game and its players with a pass over `raw_stats` per
+    player. Kept for comparison with `prettify_stats`.
+
+    Args:
+        raw_stats: Parsed statistics.
+        reporter_name: Name of the current player to parse the game status from.
+
+    Returns:
+        Prettified stats.
+    """
     players_stats = []
     for suffix in PLAYER_SUFFIXES:
         player_raw_stats = {
@@ -278,30 +826,117 @@ def process_stats(stats_file: str, output_folder: str, reporter_name: str) -> st
         tag: value for tag, value in raw_stats.items() if tag[-1] not in PLAYER_SUFFIXES
     }
     game_stats = prettify_game_stats(game_raw_stats)
-    game_result = "unknown"
-    for player_stats in players_stats:
-        if player_stats["name"] == reporter_name:
-            for status in mappings.COMPLETION_CODES.values():
-                if player_stats[status] is True:
-                    game_result = status
-                    break
 
-    stats: Dict[str, Union[str, _PrettifiedStatsType, List[_PrettifiedStatsType]]] = {
+    return {
         "gameReport": game_stats,
         "playerStats": players_stats,
-        "gameResult": game_result,
+        "gameResult": _game_result(players_stats, reporter_name),
     }
 
-    timestamp = game_stats["epoch_time"]
+
+def _write_stats(
+    raw_stats: Dict[str, _DecodedBlockType],
+    stats: _GameStatsType,
+    output_folder: str,
+    timestamp: int,
+) -> str:
+    """
+    Save raw and prettified stats of a game, return path to the latter.
+    """
+    write_dict_to_json(
+        raw_stats, os.path.join(output_folder, f"{timestamp}_stats_raw.json")
+    )
+    stats_json_file = os.path.join(output_folder, f"{timestamp}_stats_parsed.json")
+    write_dict_to_json(stats, stats_json_file)
+    return stats_json_file
+
+
+def process_stats(
+    stats_file: str,
+    output_folder: str,
+    reporter_name: str,
+    game_index: Optional["gameindex.GameIndex"] = None,
+    source: Optional[str] = None,
+) -> str:
+    """
+    Backup, parse and prettify a `"stats.dmp"` file.
+
+    Args:
+        stats_file: `"stats.dmp"` file.
+        output_folder: Backup folder.
+        reporter_name: Name of the current player to parse the game status from.
+        game_index: Index to add the game to.
+        source: Game install the game was played on, saved as `"source"` of
+            the game report.
+
+    Returns:
+        Path to the prettified stats in JSON format.
+    """
+    if not os.path.isfile(stats_file):
+        raise FileNotFoundError(
+            f'Given path "{stats_file}" does not exist or is not a file.'
+        )
+
+    raw_stats = parse_stats(stats_file)
+    stats = prettify_stats(raw_stats, reporter_name)
+    if source is not None:
+        stats["gameReport"]["source"] = source
+
+    timestamp = stats["gameReport"]["epoch_time"]
     output_folder = os.path.join(
         output_folder,
         datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H-%M-%S"),
     )
     os.makedirs(output_folder, exist_ok=True)
     shutil.copy(stats_file, os.path.join(output_folder, f"{timestamp}_stats.dmp"))
-    write_dict_to_json(
-        raw_stats, os.path.join(output_folder, f"{timestamp}_stats_raw.json")
+    parsed_file = _write_stats(raw_stats, stats, output_folder, timestamp)
+    if game_index is not None:
+        game_index.add_game(stats, parsed_file)
+    return parsed_file
+
+
+def reprocess_archived_stats(stats_file: str, reporter_name: str) -> str:
+    """
+    Parse and prettify a `"stats.dmp"` file backed up by `process_stats` again,
+    e.g. after `mappings` changed. JSON files next to it are overwritten, the
+    source of the game is kept.
+
+    Args:
+        stats_file: Backed up `"<timestamp>_stats.dmp"` file.
+        reporter_name: Name of the current player to parse the game status from.
+
+    Returns:
+        Path to the prettified stats in JSON format.
+    """
+    raw_stats = parse_stats(stats_file)
+    stats = prettify_stats(raw_stats, reporter_name)
+    timestamp = stats["gameReport"]["epoch_time"]
+    output_folder = os.path.dirname(stats_file)
+    try:
+        with open(
+            os.path.join(output_folder, f"{timestamp}_stats_parsed.json"), "r"
+        ) as file:
+            source = json.load(file)["gameReport"].get("source")
+    except (OSError, ValueError, KeyError):
+        source = None
+    if source is not None:
+        stats["gameReport"]["source"] = source
+    return _write_stats(raw_stats, stats, output_folder, timestamp)
+
+
+@lru_cache(maxsize=None)
+def mappings_fingerprint() -> str:
+    """
+    Fingerprint of `mappings` used for prettifying. Prettified stats produced
+    with a different fingerprint are outdated.
+    """
+    content = json.dumps(
+        [
+            mappings.SIDES,
+            mappings.COMPLETION_CODES,
+            mappings.HUMAN_READABLE_COUNTABLES,
+            mappings.COUNTABLE_TYPES,
+        ],
+        sort_keys=True,
     )
-    stats_json_file = os.path.join(output_folder, f"{timestamp}_stats_parsed.json")
-    write_dict_to_json(stats, stats_json_file)
-    return stats_json_file
+    return hashlib.sha1(content.encode("ascii")).hexdigest()
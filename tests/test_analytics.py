@@ -0,0 +1,96 @@
+import collections
+import random
+
+import pytest
+
+import analytics
+import mappings
+
+SIDES = list(mappings.SIDES.values())
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rng = random.Random(0)
+    rows = []
+    for game in range(500):
+        epoch_time = 1600000000 + game * 60
+        map_ = rng.choice(["Dustbowl", "Heckbends", "Lake Blitzen"])
+        duration = rng.randint(60, 3600)
+        players = rng.choice([2, 2, 3])
+        winner = rng.randrange(players)
+        for player in range(players):
+            rows.append(
+                (
+                    epoch_time,
+                    map_,
+                    duration,
+                    rng.choice(["Kane", "kane", "Tanya", "Boris"]),
+                    rng.choice(SIDES + [None]),
+                    "won" if player == winner else "defeated",
+                )
+            )
+    return rows
+
+
+def naive_group_by(rows, key):
+    games = collections.Counter()
+    wins = collections.Counter()
+    for row in rows:
+        games[key(row)] += 1
+        wins[key(row)] += row[5] == "won"
+    return {group: (games[group], wins[group]) for group in games}
+
+
+def test_group_by_matches_naive_counts(rows):
+    columns = analytics.GameColumns(rows)
+    assert len(columns) == len(rows)
+    groups = columns.group_by(["player", "side"])
+    assert {
+        (group["player"], group["side"]): (group["games"], group["wins"])
+        for group in groups
+    } == naive_group_by(rows, lambda row: (row[3], row[4]))
+    assert [group["games"] for group in groups] == sorted(
+        (group["games"] for group in groups), reverse=True
+    )
+
+
+def test_resolve_name(rows):
+    columns = analytics.GameColumns(rows, str.lower)
+    assert sorted(columns.categories["player"].names) == ["boris", "kane", "tanya"]
+    groups = columns.group_by(["player"], columns.mask(map="Dustbowl"))
+    dustbowl_rows = [row for row in rows if row[1] == "Dustbowl"]
+    assert {
+        group["player"]: (group["games"], group["wins"]) for group in groups
+    } == naive_group_by(dustbowl_rows, lambda row: row[3].lower())
+
+
+def test_opponents_of_two_player_games(rows):
+    columns = analytics.GameColumns(rows)
+    games = collections.defaultdict(list)
+    for row in rows:
+        games[row[0]].append(row)
+    i = 0
+    for players in games.values():
+        for j in range(len(players)):
+            if len(players) == 2:
+                opponent = players[1 - j][3]
+                assert columns.categories["player"].names[columns.opponent[i]] == (
+                    opponent
+                )
+            else:
+                assert columns.opponent[i] == -1
+            i += 1
+
+
+def test_mask_of_unknown_name(rows):
+    columns = analytics.GameColumns(rows)
+    assert not columns.mask(player="Unknown").any()
+    since = rows[len(rows) // 2][0]
+    assert columns.mask(since=since).sum() == sum(row[0] > since for row in rows)
+
+
+def test_no_rows():
+    columns = analytics.GameColumns([])
+    assert len(columns) == 0
+    assert columns.group_by(["player"]) == []
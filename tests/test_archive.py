@@ -0,0 +1,91 @@
+import os
+
+import archive
+import dmpgen
+import statparser
+
+EPOCH_TIMES = [1600000000 + i * 60 for i in range(5)]
+
+
+def archive_games(game_archive, tmp_path, epoch_times=EPOCH_TIMES):
+    stats = []
+    for epoch_time in epoch_times:
+        stats_file = str(tmp_path / f"{epoch_time}.dmp")
+        dmpgen.write_stats(stats_file, epoch_time=epoch_time, seed=epoch_time)
+        stats.append(
+            archive.archive_stats(game_archive, stats_file, dmpgen.PLAYER_NAMES[0])
+        )
+    return stats
+
+
+def test_round_trip(tmp_path):
+    game_archive = archive.GameArchive(str(tmp_path / "archive"))
+    stats = archive_games(game_archive, tmp_path, reversed(EPOCH_TIMES))[::-1]
+    assert len(game_archive) == 5
+    assert list(game_archive.iter_stats()) == stats
+
+    reopened = archive.GameArchive(str(tmp_path / "archive"))
+    games = list(reopened.iter_games(with_dmp=True))
+    assert [game[0] for game in games] == stats
+    for (game_stats, dmp), epoch_time in zip(games, EPOCH_TIMES):
+        with open(tmp_path / f"{epoch_time}.dmp", "rb") as file:
+            assert dmp == file.read()
+        assert (
+            statparser.prettify_stats(
+                statparser.parse_stats_buffer(dmp), dmpgen.PLAYER_NAMES[0]
+            )
+            == game_stats
+        )
+
+
+def test_time_range(tmp_path):
+    game_archive = archive.GameArchive(str(tmp_path / "archive"))
+    stats = archive_games(game_archive, tmp_path)
+    assert game_archive.epoch_times(EPOCH_TIMES[1], EPOCH_TIMES[3]) == (
+        EPOCH_TIMES[2:4]
+    )
+    assert list(game_archive.iter_stats(since=EPOCH_TIMES[3])) == stats[4:]
+    assert list(game_archive.iter_stats(until=EPOCH_TIMES[0])) == stats[:1]
+
+
+def test_append_known_game(tmp_path):
+    game_archive = archive.GameArchive(str(tmp_path / "archive"))
+    stats = archive_games(game_archive, tmp_path)
+    assert not game_archive.append(stats[0])
+    assert len(game_archive) == 5
+
+
+def test_segments(tmp_path):
+    game_archive = archive.GameArchive(str(tmp_path / "archive"), 4096)
+    stats = archive_games(game_archive, tmp_path)
+    assert len(os.listdir(tmp_path / "archive")) > 2
+    reopened = archive.GameArchive(str(tmp_path / "archive"), 4096)
+    assert list(reopened.iter_stats()) == stats
+
+
+def test_torn_index_entry(tmp_path):
+    folder = tmp_path / "archive"
+    stats = archive_games(archive.GameArchive(str(folder)), tmp_path)
+    index_file = folder / archive.INDEX_FILE
+    with open(index_file, "ab") as file:
+        file.write(b"\x00\x00\x00")
+
+    game_archive = archive.GameArchive(str(folder))
+    assert list(game_archive.iter_stats()) == stats
+    assert os.path.getsize(index_file) % archive._INDEX_ENTRY_STRUCT.size == 0
+    stats += archive_games(game_archive, tmp_path, [EPOCH_TIMES[-1] + 60])
+    assert list(archive.GameArchive(str(folder)).iter_stats()) == stats
+
+
+def test_index_entry_of_lost_record(tmp_path):
+    folder = tmp_path / "archive"
+    stats = archive_games(archive.GameArchive(str(folder)), tmp_path)
+    # The last record is lost, e.g. the segment was restored from a backup.
+    segment_file = folder / archive.SEGMENT_FILE_PATTERN.format(0)
+    offset = archive.GameArchive(str(folder))._positions[-1][1]
+    with open(segment_file, "r+b") as file:
+        file.truncate(offset)
+
+    game_archive = archive.GameArchive(str(folder))
+    assert game_archive.epoch_times() == EPOCH_TIMES[:-1]
+    assert list(game_archive.iter_stats()) == stats[:-1]
@@ -0,0 +1,32 @@
+import pytest
+
+import benchmark
+
+
+@pytest.fixture(scope="module")
+def fixtures(tmp_path_factory):
+    return benchmark.Fixtures(str(tmp_path_factory.mktemp("benchmark")), 3, 2, 0.2, 1)
+
+
+@pytest.mark.parametrize("name", list(benchmark.BENCHMARKS))
+def test_run_benchmark(fixtures, name):
+    try:
+        done, _, peak_memory = benchmark.run_benchmark(
+            benchmark.BENCHMARKS[name], fixtures, 5, None, True
+        )
+    except benchmark.SkippedBenchmark:
+        pytest.skip()
+    assert done == 5
+    assert peak_memory > 0
+
+
+def test_run_batch_benchmark(fixtures):
+    setup = benchmark.BATCH_BENCHMARKS["aggregate_game_stats_multi"]
+    done, _, _ = benchmark.run_benchmark(setup, fixtures, 1, None, False, True)
+    assert done == 3
+
+
+def test_compare_results():
+    baseline = {"a[1]": {"games_per_sec": 100.0, "peak_memory_mib": 1.0}}
+    results = {"a[1]": {"games_per_sec": 70.0, "peak_memory_mib": 1.1}}
+    assert len(benchmark.compare_results(results, baseline, 0.2)) == 1
@@ -0,0 +1,40 @@
+import pytest
+
+import dmpgen
+import statparser
+
+
+@pytest.fixture(params=[(1, 0), (2, 1), (8, 2)])
+def stats_file(request, tmp_path):
+    players, seed = request.param
+    filepath = str(tmp_path / "stats.dmp")
+    dmpgen.write_stats(filepath, players=players, unknown_tags=4, seed=seed)
+    return filepath
+
+
+def test_parse_stats_matches_legacy(stats_file):
+    assert statparser.parse_stats(stats_file) == statparser.parse_stats_legacy(
+        stats_file
+    )
+
+
+def test_prettify_stats_matches_legacy(stats_file):
+    stats = statparser.parse_stats(stats_file)
+    reporter_name = dmpgen.PLAYER_NAMES[0]
+    assert statparser.prettify_stats(stats, reporter_name) == (
+        statparser.prettify_stats_legacy(stats, reporter_name)
+    )
+
+
+def test_parse_stats_countables_as_arrays(stats_file):
+    stats = statparser.parse_stats(stats_file)
+    arrays = statparser.parse_stats(stats_file, countables_as_arrays=True)
+    assert {
+        tag: value.as_dict() if isinstance(value, statparser.Countables) else value
+        for tag, value in arrays.items()
+    } == stats
+
+
+def test_generate_stats_is_reproducible():
+    assert dmpgen.generate_stats(seed=1) == dmpgen.generate_stats(seed=1)
+    assert dmpgen.generate_stats(seed=1) != dmpgen.generate_stats(seed=2)
@@ -0,0 +1,130 @@
+import pytest
+
+import dmpgen
+import gameindex
+import statparser
+
+EPOCH_TIMES = [1600000000 + i * 60 for i in range(6)]
+
+
+@pytest.fixture
+def game_stats_folder(tmp_path):
+    folder = tmp_path / "games"
+    for i, epoch_time in enumerate(EPOCH_TIMES):
+        stats_file = str(tmp_path / "stats.dmp")
+        dmpgen.write_stats(
+            stats_file, players=2 + i % 3, epoch_time=epoch_time, seed=epoch_time
+        )
+        statparser.process_stats(stats_file, str(folder), dmpgen.PLAYER_NAMES[0])
+    return str(folder)
+
+
+@pytest.fixture
+def game_index(tmp_path, game_stats_folder):
+    with gameindex.GameIndex(str(tmp_path / "index" / "games.sqlite")) as game_index:
+        assert gameindex.backfill(game_index, game_stats_folder) == len(EPOCH_TIMES)
+        yield game_index
+
+
+def test_time_range(game_index):
+    assert len(game_index) == len(EPOCH_TIMES)
+    assert [game.epoch_time for game in game_index.iter_games()] == EPOCH_TIMES
+    games = list(game_index.iter_games(EPOCH_TIMES[1], EPOCH_TIMES[3]))
+    assert [game.epoch_time for game in games] == EPOCH_TIMES[2:4]
+    for game in games:
+        stats = gameindex.read_parsed_game(game.path)
+        assert stats["gameReport"]["epoch_time"] == game.epoch_time
+        assert stats["gameReport"]["map"] == game.map
+
+
+def test_process_stats_adds_to_index(tmp_path, game_index):
+    stats_file = str(tmp_path / "stats.dmp")
+    epoch_time = EPOCH_TIMES[-1] + 60
+    dmpgen.write_stats(stats_file, epoch_time=epoch_time)
+    parsed_file = statparser.process_stats(
+        stats_file, str(tmp_path / "games"), dmpgen.PLAYER_NAMES[0], game_index
+    )
+    assert game_index.paths(since=EPOCH_TIMES[-1]) == [parsed_file]
+
+
+def test_add_known_game_replaces_it(game_index):
+    path = game_index.paths()[0]
+    stats = gameindex.read_parsed_game(path)
+    stats["gameReport"]["map"] = "Renamed"
+    game_index.add_game(stats, path)
+    assert len(game_index) == len(EPOCH_TIMES)
+    assert next(game_index.iter_games()).map == "Renamed"
+
+
+def test_backfill_replace(tmp_path, game_index):
+    assert gameindex.backfill(game_index, str(tmp_path / "empty"), True) == 0
+    assert len(game_index) == 0
+
+
+def naive_iter_games(game_index, names=None, side=None, result=None, **filters):
+    for game in game_index.iter_games():
+        if filters.get("map_") is not None and game.map != filters["map_"]:
+            continue
+        if filters.get("min_duration", 0) > game.duration:
+            continue
+        players_stats = gameindex.read_parsed_game(game.path)["playerStats"]
+        if any(
+            (names is None or stats["name"] in names)
+            and (side is None or stats.get("side") == side)
+            and (result is None or gameindex.player_result(stats) == result)
+            for stats in players_stats
+        ):
+            yield game
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {"names": [dmpgen.PLAYER_NAMES[2]]},
+        {"names": dmpgen.PLAYER_NAMES[2:4], "result": "won"},
+        {"names": [dmpgen.PLAYER_NAMES[0]], "result": "defeated"},
+        {"names": ["Unknown"]},
+        {"names": []},
+        {"min_duration": 1800},
+    ],
+)
+def test_filters(game_index, filters):
+    assert list(game_index.iter_games(**filters)) == list(
+        naive_iter_games(game_index, **filters)
+    )
+
+
+def test_map_filter(game_index):
+    map_ = next(game_index.iter_games()).map
+    assert list(game_index.iter_games(map_=map_)) == list(
+        naive_iter_games(game_index, map_=map_)
+    )
+
+
+def test_player_filters_match_the_same_player(game_index):
+    stats = gameindex.read_parsed_game(game_index.paths()[0])
+    loser = next(player for player in stats["playerStats"] if not player["won"])
+    filters = {"names": [loser["name"]], "side": loser["side"]}
+    assert list(game_index.iter_games(**filters)) == list(
+        naive_iter_games(game_index, **filters)
+    )
+    filters["result"] = "won"
+    assert list(game_index.iter_games(**filters)) == list(
+        naive_iter_games(game_index, **filters)
+    )
+
+
+def test_names_of_resolved_aliases(game_index):
+    aliases = {dmpgen.PLAYER_NAMES[2]: dmpgen.PLAYER_NAMES[3]}
+    games = list(
+        game_index.iter_games(
+            names=[dmpgen.PLAYER_NAMES[3]],
+            resolve_name=lambda name: aliases.get(name, name),
+        )
+    )
+    assert games == list(naive_iter_games(game_index, names=dmpgen.PLAYER_NAMES[2:4]))
+    assert games != list(naive_iter_games(game_index, names=dmpgen.PLAYER_NAMES[3:4]))
+
+
+def test_player_names(game_index):
+    assert sorted(game_index.player_names()) == sorted(dmpgen.PLAYER_NAMES[:4])
@@ -0,0 +1,41 @@
+import records
+import statparser
+
+GAME = {
+    "gameReport": {"epoch_time": 1600000000, "map": "Dustbowl", "duration": 600},
+    "playerStats": [
+        {
+            "name": "Player",
+            "side": "Soviet",
+            "won": True,
+            "units_built": 3,
+            "detailed_counts": {"units_built": {"AMCV": 1, "HARV": 2}},
+        },
+        {
+            "name": "Opponent",
+            "side": "Allied",
+            "defeated": True,
+            "units_built": 1,
+            "detailed_counts": {"units_built": {"Renamed": 1}},
+        },
+    ],
+    "gameResult": "won",
+}
+
+
+def test_game_record_round_trip():
+    record = records.GameRecord.from_dict(GAME)
+    assert record.to_dict() == GAME
+    assert record.epoch_time == 1600000000
+    assert [player.total("units_built") for player in record.players] == [3, 1]
+
+
+def test_detailed_counts_aligned_unless_type_names_unknown():
+    player, opponent = records.GameRecord.from_dict(GAME).players
+    assert isinstance(player.detailed_counts["units_built"], statparser.Countables)
+    assert opponent.detailed_counts["units_built"] == {"Renamed": 1}
+
+
+def test_player_stats_saved_as_dict():
+    data = dict(GAME, playerStats=dict(enumerate(GAME["playerStats"])))
+    assert records.GameRecord.from_dict(data) == records.GameRecord.from_dict(GAME)
@@ -0,0 +1,127 @@
+import struct
+
+import pytest
+
+import statparser
+
+
+def encode_block(tag: str, type_: int, data: bytes) -> bytes:
+    return (
+        struct.pack(">4sHH", tag.encode("ascii"), type_, len(data))
+        + data
+        + b"\x00" * (-len(data) % 4)
+    )
+
+
+def encode_stats(*blocks: bytes) -> bytes:
+    return b"\x00\x00\x00\x00" + b"".join(blocks)
+
+
+STATS = encode_stats(
+    encode_block("GSKU", 6, struct.pack(">L", 10496)),
+    encode_block("DURA", 6, struct.pack(">L", 1234)),
+    encode_block("AFPS", 5, struct.pack(">l", -60)),
+    encode_block("QUIT", 2, struct.pack(">?", True)),
+    encode_block("ALY0", 3, struct.pack(">h", -1)),
+    encode_block("SPID", 4, struct.pack(">H", 7)),
+    encode_block("NAM0", 7, b"Player\x00\x00"),
+    encode_block("UNB0", 20, struct.pack(">5L", 0, 3, 0, 0, 12)),
+    encode_block("VSB0", 20, struct.pack(">3L", 0, 0, 0)),
+    encode_block("RAW0", 20, b"\x01\x02\x03"),
+)
+
+
+@pytest.fixture
+def stats_file(tmp_path):
+    filepath = tmp_path / "stats.dmp"
+    filepath.write_bytes(STATS)
+    return str(filepath)
+
+
+def test_parse_stats_matches_legacy(stats_file):
+    stats = statparser.parse_stats(stats_file)
+    assert stats == statparser.parse_stats_legacy(stats_file)
+    assert stats["NAM0"] == "Player"
+    assert stats["VSB0"] == {}
+    assert stats["RAW0"] == "AQID"
+
+
+def test_parse_stats_buffer_of_memoryview():
+    assert statparser.parse_stats_buffer(memoryview(STATS)) == (
+        statparser.parse_stats_buffer(STATS)
+    )
+
+
+def test_parse_stats_of_empty_file(tmp_path):
+    filepath = tmp_path / "stats.dmp"
+    filepath.write_bytes(b"")
+    with pytest.raises(ValueError):
+        statparser.parse_stats(str(filepath))
+
+
+@pytest.mark.parametrize("size", [len(STATS) - 2, 10])
+def test_parse_stats_of_truncated_file(tmp_path, size):
+    filepath = tmp_path / "stats.dmp"
+    filepath.write_bytes(STATS[:size])
+    with pytest.raises(ValueError):
+        statparser.parse_stats(str(filepath))
+
+
+def test_parse_stats_countables_as_arrays(stats_file):
+    stats = statparser.parse_stats(stats_file, countables_as_arrays=True)
+    assert isinstance(stats["UNB0"], statparser.Countables)
+    assert stats["UNB0"].as_dict() == statparser.parse_stats(stats_file)["UNB0"]
+    assert stats["UNB0"].total() == 15
+    assert stats["VSB0"].as_dict() == {}
+
+
+def test_countables_drop_zero_counts_beyond_known_types():
+    countables = statparser.Countables.from_buffer("VS", bytes(16), 0, 4)
+    assert countables.as_dict() == {}
+    with pytest.raises(IndexError):
+        statparser.Countables.from_buffer("VS", struct.pack(">L", 1), 0, 1)
+    buffer = struct.pack(">4L", 1, 0, 0, 0)
+    assert statparser.Countables.from_buffer("UN", buffer, 0, 4).as_dict() == {
+        "AMCV": 1
+    }
+
+
+def test_countables_from_dict():
+    counts = {"HARV": 2, "AMCV": 1}
+    countables = statparser.Countables.from_dict("UN", counts)
+    assert countables.as_dict() == counts
+    with pytest.raises(ValueError):
+        statparser.Countables.from_dict("UN", {"Renamed": 1})
+
+
+def test_countables_sums_do_not_wrap():
+    countables = statparser.Countables.from_dict("UN", {"AMCV": 2**32 - 1})
+    countables += statparser.Countables.from_dict("UN", {"AMCV": 2**32 - 1})
+    assert countables.as_dict() == {"AMCV": 2 * (2**32 - 1)}
+
+
+def write_game(filepath, epoch_time, duration):
+    filepath.write_bytes(
+        encode_stats(
+            encode_block("TIME", 6, struct.pack(">L", epoch_time)),
+            encode_block("DURA", 6, struct.pack(">L", duration)),
+            encode_block("NAM0", 7, b"Player\x00"),
+            encode_block("NAM1", 7, b"Opponent\x00"),
+        )
+    )
+    return str(filepath)
+
+
+def test_fingerprint_stats(tmp_path):
+    fingerprint = statparser.fingerprint_stats(
+        write_game(tmp_path / "a.dmp", 1600000000, 60)
+    )
+    rewritten = write_game(tmp_path / "b.dmp", 1600000000, 600)
+    assert statparser.fingerprint_stats(rewritten) == fingerprint
+    other = write_game(tmp_path / "c.dmp", 1600000060, 60)
+    assert statparser.fingerprint_stats(other) != fingerprint
+
+
+def test_fingerprint_stats_without_start_time(stats_file):
+    with pytest.raises(ValueError):
+        statparser.fingerprint_stats(stats_file)
@@ -0,0 +1,144 @@
+import asyncio
+import gzip
+import os
+
+import pytest
+
+import webserver
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "stats").mkdir()
+    (tmp_path / "stats" / "index.html").write_text("<html></html>")
+    (tmp_path / "secret.txt").write_text("secret")
+    return webserver.StatsWebServer(str(tmp_path / "stats"))
+
+
+@pytest.mark.parametrize(
+    "target",
+    [
+        "/../secret.txt",
+        "/%2e%2e/secret.txt",
+        "/a/../../secret.txt",
+        "/..%2fsecret.txt",
+    ],
+)
+def test_resolve_rejects_targets_outside_of_the_folder(server, target):
+    assert server.resolve(target) is None
+    status, _, _ = asyncio.run(server.respond("GET", target, {}))
+    assert status == 404
+
+
+def test_resolve(server):
+    index_file = os.path.join(server.folder, "index.html")
+    assert server.resolve("/") == index_file
+    assert server.resolve("/index.html?v=1") == index_file
+    assert server.resolve("/a/../index.html") == index_file
+    assert server.resolve("/sub%20folder/x.json") == os.path.join(
+        server.folder, "sub folder", "x.json"
+    )
+
+
+def test_respond(server):
+    status, headers, body = asyncio.run(server.respond("GET", "/", {}))
+    assert (status, body) == (200, b"<html></html>")
+    assert headers["Content-Type"].startswith("text/html")
+    assert asyncio.run(server.respond("GET", "/missing.html", {}))[0] == 404
+    assert asyncio.run(server.respond("POST", "/", {}))[0] == 405
+
+
+def test_etag(server):
+    _, headers, _ = asyncio.run(server.respond("GET", "/", {}))
+    etag = headers["ETag"]
+    status, headers, body = asyncio.run(
+        server.respond("GET", "/", {"if-none-match": f'W/"x", {etag}'})
+    )
+    assert (status, body) == (304, b"")
+    assert headers["ETag"] == etag
+
+    server.publish(os.path.join(server.folder, "index.html"), b"<html>new</html>")
+    status, headers, body = asyncio.run(
+        server.respond("GET", "/", {"if-none-match": etag})
+    )
+    assert (status, body) == (200, b"<html>new</html>")
+    assert headers["ETag"] != etag
+
+
+def test_gzip(server):
+    text = b"<html>" + b"stats " * 1000 + b"</html>"
+    server.publish(os.path.join(server.folder, "index.html"), text)
+    status, headers, body = asyncio.run(
+        server.respond("GET", "/", {"accept-encoding": "gzip, deflate"})
+    )
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == text
+    _, headers, body = asyncio.run(server.respond("GET", "/", {}))
+    assert "Content-Encoding" not in headers
+    assert body == text
+
+
+def test_changed_files_are_read_again(server):
+    filepath = os.path.join(server.folder, "stats.json")
+    with open(filepath, "w") as file:
+        file.write("{}")
+    assert asyncio.run(server.respond("GET", "/stats.json", {}))[2] == b"{}"
+    with open(filepath, "w") as file:
+        file.write('{"games_played": 1}')
+    os.utime(filepath, ns=(0, 0))
+    assert asyncio.run(server.respond("GET", "/stats.json", {}))[2] == (
+        b'{"games_played": 1}'
+    )
+    os.remove(filepath)
+    assert asyncio.run(server.respond("GET", "/stats.json", {}))[0] == 404
+
+
+def test_keep_alive(server):
+    async def get_twice():
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            responses = []
+            for _ in range(2):
+                writer.write(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+                responses.append((head, await reader.readexactly(length)))
+            return responses
+        finally:
+            writer.close()
+            await server.close()
+
+    server.host, server.port = "127.0.0.1", 0
+    for head, body in asyncio.run(get_twice()):
+        assert head.startswith(b"HTTP/1.1 200 OK\r\n")
+        assert b"Connection: keep-alive\r\n" in head
+        assert body == b"<html></html>"
+
+
+def test_event_stream(server):
+    filepath = os.path.join(server.folder, "index.html")
+
+    async def stream():
+        await server.start()
+        port = server._server.sockets[0].getsockname()[1]
+        server.publish_event(filepath, "first")
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            writer.write(b"GET / HTTP/1.1\r\nAccept: text/event-stream\r\n\r\n")
+            head = await reader.readuntil(b"\r\n\r\n")
+            first = await reader.readuntil(b"\n\n")
+            server.publish_event(filepath, "second\nline")
+            second = await reader.readuntil(b"\n\n")
+            await server.close()
+            return head, first, second, await reader.read()
+        finally:
+            writer.close()
+
+    server.host, server.port = "127.0.0.1", 0
+    head, first, second, rest = asyncio.run(stream())
+    assert b"Content-Type: text/event-stream" in head
+    assert first == b"data: first\n\n"
+    assert second == b"data: second\ndata: line\n\n"
+    assert rest == b""
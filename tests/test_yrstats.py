@@ -0,0 +1,181 @@
+import asyncio
+import copy
+import json
+import os
+import socket
+import threading
+from datetime import datetime
+
+import pytest
+
+import dmpgen
+import statparser
+import yrstats
+
+# Three games a month over three months.
+EPOCH_TIMES = [1577836800 + i * 10 * 86400 for i in range(9)]
+
+
+def add_counts(*counts):
+    aggregated_counts = {"UN": {}}
+    for game_counts in counts:
+        yrstats.add_detailed_counts(aggregated_counts, "UN", game_counts)
+    aggregated = aggregated_counts["UN"]
+    if isinstance(aggregated, statparser.Countables):
+        return aggregated.as_dict()
+    return aggregated
+
+
+def test_add_detailed_counts_of_arrays_and_dicts():
+    counts = [{"AMCV": 1}, {"AMCV": 2, "HARV": 1}, {"HARV": 4}]
+    arrays = [statparser.Countables.from_dict("UN", c) for c in counts]
+    expected = {"AMCV": 3, "HARV": 5}
+    assert add_counts(*counts) == expected
+    assert add_counts(*arrays) == expected
+    assert add_counts(counts[0], arrays[1], counts[2]) == expected
+
+
+def test_add_detailed_counts_of_unknown_type_names():
+    arrays = statparser.Countables.from_dict("UN", {"AMCV": 1})
+    expected = {"AMCV": 2, "Renamed": 1}
+    assert add_counts(arrays, {"Renamed": 1}, arrays) == expected
+    assert add_counts({"Renamed": 1}, arrays, arrays) == expected
+
+
+def test_seen_games_persist_most_recent(tmp_path):
+    file = str(tmp_path / "stats" / "seen_games.json")
+    seen_games = yrstats.SeenGames(file, max_size=2)
+    for fingerprint in ("a", "b", "c"):
+        seen_games.add(fingerprint)
+    seen_games = yrstats.SeenGames(file, max_size=2)
+    assert "a" not in seen_games
+    assert "b" in seen_games and "c" in seen_games
+
+
+@pytest.fixture
+def config(tmp_path):
+    folder = tmp_path / "games"
+    for epoch_time in EPOCH_TIMES:
+        stats_file = str(tmp_path / "stats.dmp")
+        dmpgen.write_stats(stats_file, epoch_time=epoch_time, seed=epoch_time)
+        statparser.process_stats(stats_file, str(folder), dmpgen.PLAYER_NAMES[0])
+    return {"gameStatsFolder": str(folder), "playerAliases": []}
+
+
+def normalized(aggregated_stats):
+    return json.loads(
+        json.dumps(yrstats.detailed_counts_as_dicts(aggregated_stats), default=list)
+    )
+
+
+def aggregate_single_pass(config, since_when, games):
+    aggregated_stats = {}
+    for epoch_time, file_path in games:
+        game = yrstats.load_game_record(file_path)
+        yrstats.aggregate_game_record(config, aggregated_stats, game, since_when)
+    return aggregated_stats
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_aggregate_game_stats_multi_matches_single_pass(config, jobs):
+    since_when = datetime.fromtimestamp(EPOCH_TIMES[0] - 1)
+    expected = normalized(
+        aggregate_single_pass(
+            config, since_when, yrstats.list_games(config, since_when)
+        )
+    )
+    for _ in range(2):
+        # Aggregates of months are cached by the first run.
+        aggregated_stats = yrstats.aggregate_game_stats_multi(
+            config, since_when, jobs=jobs
+        )[0]
+        assert normalized(aggregated_stats) == expected
+
+
+def test_merge_aggregated_stats_is_associative(config):
+    since_when = datetime.fromtimestamp(EPOCH_TIMES[0] - 1)
+    games = yrstats.list_games(config, since_when)
+    shards = [
+        aggregate_single_pass(config, since_when, games[i : i + 4])
+        for i in range(0, len(games), 4)
+    ]
+    expected = normalized(aggregate_single_pass(config, since_when, games))
+
+    left = {}
+    for shard in copy.deepcopy(shards):
+        yrstats.merge_aggregated_stats(left, shard)
+    assert normalized(left) == expected
+
+    shards = copy.deepcopy(shards)
+    right = yrstats.merge_aggregated_stats(
+        {}, yrstats.merge_aggregated_stats(shards[1], shards[2])
+    )
+    assert normalized(yrstats.merge_aggregated_stats(shards[0], right)) == expected
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    config = {
+        "thisPlayerName": dmpgen.PLAYER_NAMES[0],
+        "gameStatsFolder": str(tmp_path / "stats" / "games"),
+        "sessionStatsFolder": str(tmp_path / "stats" / "sessions"),
+        "overallStatsFolder": str(tmp_path / "stats" / "overall"),
+        "playerAliases": [],
+    }
+    # Written by update-overall-stats before the watcher is started.
+    os.makedirs(config["overallStatsFolder"])
+    with open(
+        yrstats.get_overall_stats_json_file(config["overallStatsFolder"]), "w"
+    ) as f:
+        json.dump({}, f)
+    dmp_file = str(tmp_path / "game" / "stats.dmp")
+    os.makedirs(os.path.dirname(dmp_file))
+    dmpgen.write_stats(dmp_file, epoch_time=EPOCH_TIMES[0])
+    ctx_obj = {"CONFIG": config, "num_games": 0}
+    return yrstats.StatsDmpWatcher(
+        ctx_obj, yrstats.get_dmp_sources([dmp_file]), datetime.now()
+    )
+
+
+def test_watcher_parses_a_game_once(watcher):
+    source, dmp_file = watcher.dmp_sources[0]
+    assert source == "game"
+    gamestats, game = watcher.parse(dmp_file, source)
+    assert game.epoch_time == EPOCH_TIMES[0]
+    assert game.report["source"] == "game"
+    assert watcher.parse(dmp_file, source) is None
+    assert watcher.aggregate((gamestats, game)) == gamestats
+    assert watcher.session_stats["games_played"] == 1
+
+
+def test_watcher_does_not_see_games_it_could_not_store(watcher, monkeypatch):
+    source, dmp_file = watcher.dmp_sources[0]
+    watcher.use_php_parser = True
+    monkeypatch.setattr(yrstats, "call_stat_dmp_parser", lambda *args: None)
+    assert watcher.parse(dmp_file, source) is None
+    assert statparser.fingerprint_stats(dmp_file) not in watcher.seen_games
+    watcher.use_php_parser = False
+    assert watcher.parse(dmp_file, source) is not None
+
+
+def test_watcher_shuts_down_when_the_web_server_can_not_start(watcher, monkeypatch):
+    with socket.socket() as taken:
+        taken.bind(("", 0))
+        taken.listen()
+        monkeypatch.setattr(yrstats, "WEB_SERVER_PORT", taken.getsockname()[1])
+        threads = set(threading.enumerate())
+        with pytest.raises(OSError):
+            asyncio.run(watcher.run(start_web_server=True))
+    assert set(threading.enumerate()) <= threads
+
+
+def test_dmp_source_drops_events_when_full(tmp_path):
+    async def put_events():
+        source = yrstats.DmpSource(
+            asyncio.get_running_loop(), "game", str(tmp_path / "stats.dmp")
+        )
+        for _ in range(yrstats.MAX_PENDING_DMP_EVENTS + 1):
+            source.put_event(source.dmp_file)
+        return source.events.qsize()
+
+    assert asyncio.run(put_events()) == yrstats.MAX_PENDING_DMP_EVENTS
@@ -0,0 +1,336 @@
+"""
+This module provides a small asyncio HTTP server of the stats folders, so the
+stat watcher serves its reports from its event loop instead of a server
+thread, and without changing the working directory.
+
+Files are served from memory. Reports are published by the stat watcher as
+they are written, other files are read once and again only when they change.
+Responses carry an ETag, so clients polling a report which did not change get
+an empty `304 Not Modified`, and text is sent gzip compressed to clients
+accepting it.
+
+`GET` requests accepting `text/event-stream`, as sent by `EventSource`, get a
+stream of the events published for the file instead, so pages can update
+themselves without polling.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+import urllib.parse
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+REQUEST_TIMEOUT_SECS = 10
+MAX_HEADERS = 100
+GZIP_LEVEL = 6
+# Comments are sent on idle event streams, so dead clients are noticed.
+EVENT_STREAM_PING_SECS = 15
+# Event stream clients falling further behind are disconnected.
+MAX_QUEUED_EVENTS = 16
+
+_REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+}
+
+_COMPRESSIBLE_TYPES = (
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+class Resource(NamedTuple):
+    body: bytes
+    gzipped_body: Optional[bytes]
+    etag: str
+    content_type: str
+    # Size and mtime of the file it was read from, `None` if published.
+    stat: Optional[Tuple[int, int]]
+
+
+def make_resource(
+    filepath: str, body: bytes, stat: Optional[Tuple[int, int]] = None
+) -> Resource:
+    """
+    Resource of the contents of a file, compressed if it is text and gets
+    smaller.
+    """
+    content_type = mimetypes.guess_type(filepath)[0] or "application/octet-stream"
+    gzipped_body = None
+    if content_type.startswith("text/") or content_type in _COMPRESSIBLE_TYPES:
+        gzipped_body = gzip.compress(body, GZIP_LEVEL)
+        if len(gzipped_body) >= len(body):
+            gzipped_body = None
+    if content_type.startswith("text/") or content_type == "application/json":
+        content_type += "; charset=utf-8"
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    return Resource(body, gzipped_body, etag, content_type, stat)
+
+
+def _load_resource(filepath: str, cached: Optional[Resource]) -> Optional[Resource]:
+    """
+    Resource of a file, `cached` if the file did not change since.
+    """
+    try:
+        st = os.stat(filepath)
+        stat = (st.st_size, st.st_mtime_ns)
+        if cached is not None and cached.stat == stat:
+            return cached
+        with open(filepath, "rb") as file:
+            return make_resource(filepath, file.read(), stat)
+    except OSError:
+        return None
+
+
+def _end_stream(queue: asyncio.Queue) -> None:
+    """
+    Make an event stream end after the events already sent to it, or right
+    away if it is full.
+    """
+    try:
+        queue.put_nowait(None)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in ("*", etag):
+            return True
+    return False
+
+
+class StatsWebServer:
+    """
+    Class for a read-only HTTP/1.1 server of the files in a folder from
+    memory, with event streams of the files. Only `GET` and `HEAD` requests
+    are served, connections are kept alive until idle for
+    `REQUEST_TIMEOUT_SECS`.
+    """
+
+    def __init__(self, folder: str, port: int = 8000, host: str = "") -> None:
+        """
+        Args:
+            folder: Folder to serve, paths of requests are relative to it.
+            port: Port to listen on.
+            host: Interface to listen on, all by default.
+        """
+        self.folder = os.path.abspath(folder)
+        self.port = port
+        self.host = host
+        self._server: Optional[asyncio.AbstractServer] = None
+        # By absolute path of the file. Replaced, never changed in place, so
+        # publishing from other threads is safe.
+        self._resources: Dict[str, Resource] = {}
+        # Queues of the event stream clients and last event, by absolute
+        # path of the file. Only used on the event loop.
+        self._event_queues: Dict[str, Set[asyncio.Queue]] = {}
+        self._last_events: Dict[str, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(
+            self._handle, self.host or None, self.port
+        )
+
+    async def close(self) -> None:
+        self._loop = None
+        for queues in self._event_queues.values():
+            for queue in queues:
+                _end_stream(queue)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def publish(self, filepath: str, body: bytes) -> None:
+        """
+        Serve new contents of a file from now on, without reading it. Can be
+        called from any thread, compression happens on the calling one.
+        """
+        filepath = os.path.abspath(filepath)
+        self._resources[filepath] = make_resource(filepath, body)
+
+    def publish_event(self, filepath: str, data: str) -> None:
+        """
+        Send an event to the event stream clients of a file, and to clients
+        connecting until the next event. Can be called from any thread, events
+        published before the server starts or after it closes are dropped.
+        """
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._push_event, os.path.abspath(filepath), data)
+
+    def _push_event(self, filepath: str, data: str) -> None:
+        self._last_events[filepath] = data
+        for queue in self._event_queues.get(filepath, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                _end_stream(queue)
+
+    def resolve(self, target: str) -> Optional[str]:
+        """
+        File of a request target, `None` for targets outside of the folder.
+        """
+        path = urllib.parse.unquote(urllib.parse.urlsplit(target).path)
+        filepath = os.path.normpath(os.path.join(self.folder, path.lstrip("/")))
+        if filepath != self.folder and not filepath.startswith(self.folder + os.sep):
+            return None
+        if os.path.isdir(filepath):
+            filepath = os.path.join(filepath, "index.html")
+        return filepath
+
+    async def get_resource(self, filepath: str) -> Optional[Resource]:
+        resource = self._resources.get(filepath)
+        if resource is not None and resource.stat is None:
+            return resource
+        loop = asyncio.get_running_loop()
+        loaded = await loop.run_in_executor(None, _load_resource, filepath, resource)
+        if loaded is None:
+            self._resources.pop(filepath, None)
+        elif loaded is not resource and self._resources.get(filepath) is resource:
+            # Unless published meanwhile.
+            self._resources[filepath] = loaded
+        return loaded
+
+    async def respond(
+        self, method: str, target: str, headers: Dict[str, str]
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Status, headers and body of the response to a request.
+        """
+        if method not in ("GET", "HEAD"):
+            return 405, {"Allow": "GET, HEAD"}, b""
+        filepath = self.resolve(target)
+        resource = await self.get_resource(filepath) if filepath else None
+        if resource is None:
+            return 404, {}, b""
+
+        response_headers = {
+            "ETag": resource.etag,
+            # Clients check back every time, usually getting a 304.
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(headers.get("if-none-match", ""), resource.etag):
+            return 304, response_headers, b""
+        response_headers["Content-Type"] = resource.content_type
+        if resource.gzipped_body is not None and "gzip" in headers.get(
+            "accept-encoding", ""
+        ):
+            response_headers["Content-Encoding"] = "gzip"
+            return 200, response_headers, resource.gzipped_body
+        return 200, response_headers, resource.body
+
+    async def _stream_events(self, filepath: str, writer: asyncio.StreamWriter) -> None:
+        """
+        Send the events of a file until the client disconnects, starting with
+        the last one.
+        """
+        queue: asyncio.Queue = asyncio.Queue(MAX_QUEUED_EVENTS)
+        if filepath in self._last_events:
+            queue.put_nowait(self._last_events[filepath])
+        self._event_queues.setdefault(filepath, set()).add(queue)
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream; charset=utf-8\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), EVENT_STREAM_PING_SECS)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                else:
+                    if data is None:
+                        break
+                    lines = data.split("\n")
+                    writer.write(
+                        "".join(f"data: {line}\n" for line in lines).encode("utf-8")
+                        + b"\n"
+                    )
+                await writer.drain()
+        finally:
+            self._event_queues[filepath].discard(queue)
+            if not self._event_queues[filepath]:
+                del self._event_queues[filepath]
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, str, Dict[str, str]]]:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if not request_line:
+            raise ConnectionResetError()
+        headers: Dict[str, str] = {}
+        for _ in range(MAX_HEADERS):
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("", "\r\n", "\n"):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) != 3:
+            return None
+        return request_line[0], request_line[1], request_line[2], headers
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                request = await asyncio.wait_for(
+                    self._read_request(reader), REQUEST_TIMEOUT_SECS
+                )
+                if request is None:
+                    status, headers, body = 400, {}, b""
+                    method = "GET"
+                    keep_alive = False
+                else:
+                    method, target, version, request_headers = request
+                    filepath = self.resolve(target)
+                    if (
+                        method == "GET"
+                        and filepath is not None
+                        and "text/event-stream" in request_headers.get("accept", "")
+                    ):
+                        await self._stream_events(filepath, writer)
+                        break
+                    connection = request_headers.get("connection", "").lower()
+                    keep_alive = (
+                        connection == "keep-alive"
+                        if version == "HTTP/1.0"
+                        else connection != "close"
+                    )
+                    status, headers, body = await self.respond(
+                        method, target, request_headers
+                    )
+                head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}"]
+                headers = dict(headers)
+                if status != 304:
+                    headers["Content-Length"] = str(len(body))
+                headers["Connection"] = "keep-alive" if keep_alive else "close"
+                head += [f"{name}: {value}" for name, value in headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
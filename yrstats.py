@@ -1,9 +1,16 @@
+import asyncio
+import bisect
+import collections
+import concurrent.futures
 import copy
 import functools
 import glob
+import hashlib
+import html
 import json
 import ntpath
 import os
+import re
 import subprocess
 import sys
 import threading
@@ -11,7 +18,6 @@ import time
 import urllib
 import webbrowser
 from datetime import datetime, date, timedelta
-from http.server import HTTPServer, CGIHTTPRequestHandler
 
 import click
 import watchdog.events
@@ -20,11 +26,33 @@ import yaml
 import colorama
 from json2html import json2html
 
+import analytics
+import archive
+import gameindex
 import mappings
+import players
+import records
 import statparser
+import webserver
 
 
 TIME_FORMAT = "%Y-%m-%d %H:%M:%S%z"
+GAME_HISTORY_PAGE_SIZE = 100
+DEFAULT_STATS_DMP_FILE = 'C:\\Program Files (x86)\\Origin Games\\Command and Conquer Red Alert II\\stats.dmp'
+DMP_POLL_INTERVAL_SECS = 0.25
+DMP_GIVE_UP_SECS = 5
+#events of a stats.dmp file only wake up its source, more than this many are dropped until it catches up
+MAX_PENDING_DMP_EVENTS = 64
+PARSE_TIMEOUT_SECS = 60
+SUBPROCESS_TIMEOUT_SECS = 300
+WEB_SERVER_PORT = 8000
+STATS_TABLE_ATTRIBUTES = "class=\"table table-condensed table-bordered table-hover\""
+#bump when the structure of aggregated stats changes, invalidates cached aggregates of months
+AGGREGATE_CACHE_VERSION = 2
+#name: number of days up to and including today
+DEFAULT_ROLLING_WINDOWS = {'today': 1, 'last_7_days': 7, 'last_30_days': 30}
+#no stats.dmp predates Yuri's Revenge, used as since time of a full rebuild
+GAME_RELEASE_TIME = datetime(2001, 10, 10)
 
 def print_info(text):
     print(colorama.Fore.YELLOW + text)
@@ -59,12 +87,87 @@ def get_overall_stats_json_file(overallStatsFolder):
 def get_overall_stats_html_file(overallStatsFolder):
     return overallStatsFolder + '/' + "overall_stats.html"
 
+def get_rolling_stats_json_file(overallStatsFolder):
+    return overallStatsFolder + '/' + "rolling_stats.json"
+
+def get_archived_game_key(gameArchiveFolder, epoch_time):
+    return gameArchiveFolder + '#' + str(epoch_time)
+
+def get_game_archive(config):
+    #archive mode: games are appended to a few large files instead of a folder per game
+    if config.get('gameArchiveFolder'):
+        return archive.GameArchive(config['gameArchiveFolder'])
+    return None
+
+def get_game_index(config):
+    #index mode: --since-* queries are range scans on a SQLite index instead of walking the game stats folder
+    if not config.get('gameIndexFile'):
+        return None
+    is_new = not os.path.isfile(config['gameIndexFile'])
+    game_index = gameindex.GameIndex(config['gameIndexFile'])
+    if is_new:
+        print_info("Indexing the games in " + config['gameStatsFolder'] + " once")
+        print_special("Indexed {} games".format(gameindex.backfill(game_index, config['gameStatsFolder'])))
+    return game_index
+
+def get_seen_games_file(gameStatsFolder):
+    return gameStatsFolder + '/' + "seen_games.json"
+
+def get_reparse_manifest_file(gameStatsFolder):
+    return gameStatsFolder + '/' + "reparse_manifest.json"
+
+def get_overall_stats_checkpoint_file(overallStatsFolder):
+    return overallStatsFolder + '/' + "overall_stats_checkpoint.json"
+
+def load_overall_stats_checkpoint(config):
+    '''Load the overall stats and their checkpoint, the checkpoint is None if missing or stale'''
+    with open(get_overall_stats_json_file(config['overallStatsFolder']), 'rb') as f:
+        blob = f.read()
+    overall_stats = json.loads(blob)
+    if 'game_history' in overall_stats:
+        get_game_history(overall_stats)
+
+    checkpoint = None
+    checkpoint_file = get_overall_stats_checkpoint_file(config['overallStatsFolder'])
+    try:
+        with open(checkpoint_file, 'r') as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print_error(checkpoint_file + " could not be parsed: " + str(e))
+    if checkpoint != None and checkpoint['fingerprint'] != hashlib.sha1(blob).hexdigest():
+        #overall stats were written without updating the checkpoint, e.g. edited by hand
+        print_info("Overall stats changed since their last checkpoint, ignoring it")
+        checkpoint = None
+    return overall_stats, checkpoint
+
+def save_overall_stats_checkpoint(config, start_time, epoch_time):
+    '''Save the high-water mark of the overall stats just written: the newest game folded in and a fingerprint of the file'''
+    with open(get_overall_stats_json_file(config['overallStatsFolder']), 'rb') as f:
+        fingerprint = hashlib.sha1(f.read()).hexdigest()
+    checkpoint = {
+        "start_time": start_time,
+        "epoch_time": epoch_time,
+        "fingerprint": fingerprint
+    }
+    checkpoint_file = get_overall_stats_checkpoint_file(config['overallStatsFolder'])
+    with open(checkpoint_file + '.tmp', 'w') as outfile:
+        json.dump(checkpoint, outfile, indent=4)
+    os.replace(checkpoint_file + '.tmp', checkpoint_file)
+    return checkpoint
+
 def call_stat_dmp_parser(config, stat_dmp_file_path = None):
     dmp_file = stat_dmp_file_path if stat_dmp_file_path != None else config['statsDmpFilePath']
     cmd = '"{}" ./statparser.php "{}" "{}" "{}"'.format(config['phpExecutable'], config['thisPlayerName'],
                    dmp_file, config['gameStatsFolder'])
     process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-    result, err = process.communicate()
+    try:
+        result, err = process.communicate(timeout=SUBPROCESS_TIMEOUT_SECS)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        print_error("statparser.php did not finish in {} seconds".format(SUBPROCESS_TIMEOUT_SECS))
+        return None
     print_special2(result.decode('utf-8'))
     if process.returncode != 0:
         print_error("Could not run statparser.php")
@@ -113,110 +216,730 @@ def write_xsplit_xml(config, session_stats):
         with open(xsplitXmlTargetPath, "w") as outfile:
             outfile.write(xsplitXmlTemplate)
 
-class StatsDmpWatcher(watchdog.events.PatternMatchingEventHandler):
-    def __init__(self, ctx_obj, dmp_file, start_time, use_php_parser=False):
+class SeenGames:
+    '''Small persistent set of fingerprints of the games processed most recently'''
+    def __init__(self, file, max_size=1000):
+        self.file = file
+        self.max_size = max_size
+        self.fingerprints = collections.OrderedDict()
+        try:
+            with open(file, 'r') as f:
+                self.fingerprints = collections.OrderedDict.fromkeys(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print_error(file + " could not be parsed")
+            print_error(e)
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self.fingerprints
+
+    def add(self, fingerprint):
+        self.fingerprints[fingerprint] = None
+        while len(self.fingerprints) > self.max_size:
+            self.fingerprints.popitem(last=False)
+        os.makedirs(os.path.dirname(os.path.abspath(self.file)), exist_ok=True)
+        with open(self.file + '.tmp', 'w') as outfile:
+            json.dump(list(self.fingerprints), outfile)
+        os.replace(self.file + '.tmp', self.file)
+
+class GameHistory:
+    '''game_history entries ordered by the epoch time of their games'''
+    def __init__(self, entries=(), epoch_times=None):
+        self._entries = []
+        self._epoch_times = []
+        if epoch_times == None:
+            #entries loaded from JSON only have the formatted start time
+            epoch_times = [int(datetime.strptime(entry['start_time'][:19], '%Y-%m-%d %H:%M:%S').timestamp()) for entry in entries]
+        for entry, epoch_time in zip(entries, epoch_times):
+            self.add(entry, epoch_time)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, i):
+        return self._entries[i]
+
+    def add(self, entry, epoch_time):
+        #games mostly arrive in time order, then this is an append
+        i = bisect.bisect_right(self._epoch_times, epoch_time)
+        self._epoch_times.insert(i, epoch_time)
+        self._entries.insert(i, entry)
+
+    def extend(self, other):
+        if not isinstance(other, GameHistory):
+            other = GameHistory(other)
+        if not self._epoch_times or not other._epoch_times or other._epoch_times[0] >= self._epoch_times[-1]:
+            self._entries.extend(other._entries)
+            self._epoch_times.extend(other._epoch_times)
+        else:
+            for entry, epoch_time in zip(other._entries, other._epoch_times):
+                self.add(entry, epoch_time)
+
+    def range(self, since=None, until=None):
+        '''entries of games started after since and at or before until (epoch times)'''
+        start = 0 if since == None else bisect.bisect_right(self._epoch_times, since)
+        end = len(self._entries) if until == None else bisect.bisect_right(self._epoch_times, until)
+        return self._entries[start:end]
+
+    def pages(self, page_size=GAME_HISTORY_PAGE_SIZE):
+        for i in range(0, len(self._entries), page_size):
+            yield self._entries[i:i + page_size]
+
+    def epoch_times(self):
+        return list(self._epoch_times)
+
+    def as_list(self):
+        #not a copy, for serialization only
+        return self._entries
+
+def json_default(o):
+    if isinstance(o, GameHistory):
+        return o.as_list()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(o).__name__))
+
+def get_game_history(aggregated_stats):
+    #game_history loaded from JSON is a plain list
+    if not isinstance(aggregated_stats.get('game_history'), GameHistory):
+        aggregated_stats['game_history'] = GameHistory(aggregated_stats.get('game_history', []))
+    return aggregated_stats['game_history']
+
+def strip_relative_start_time(aggregated_stats, epoch_time):
+    for game_history in get_game_history(aggregated_stats).range(epoch_time - 1, epoch_time):
+        if 'relative_start_time' in game_history:
+            del game_history['relative_start_time']
+
+class RollingStats:
+    '''Aggregates of the last days (rolling windows), merged from one aggregate per day'''
+    def __init__(self, config, windows):
+        self.config = config
+        self.windows = windows
+        self.buckets = {}
+
+    def _first_day(self, today):
+        return today - timedelta(days=max(self.windows.values()) - 1)
+
+    def seed(self, today):
+        #the only read of stored games, later games are added as they arrive
+        since_when = datetime.combine(self._first_day(today), datetime.min.time())
+        days = collections.OrderedDict()
+        for epoch_time, key in list_games(self.config, since_when - timedelta(seconds=1)):
+            days.setdefault(date.fromtimestamp(epoch_time), []).append((epoch_time, key))
+        for day, games in days.items():
+            bucket, epoch_times = _aggregate_shard(self.config, since_when, games)
+            for epoch_time in epoch_times:
+                strip_relative_start_time(bucket, epoch_time)
+            self.buckets[day] = bucket
+
+    def add(self, game):
+        day = date.fromtimestamp(game.epoch_time)
+        if day not in self.buckets:
+            self.buckets[day] = {}
+        aggregate_game_record(self.config, self.buckets[day], game, datetime.combine(day, datetime.min.time()))
+        strip_relative_start_time(self.buckets[day], game.epoch_time)
+
+    def expire(self, today):
+        first_day = self._first_day(today)
+        for day in [day for day in self.buckets if day < first_day]:
+            del self.buckets[day]
+
+    def window(self, days, today):
+        first_day = today - timedelta(days=days - 1)
+        window_stats = {}
+        for day in sorted(self.buckets):
+            if first_day <= day <= today:
+                merge_aggregated_stats(window_stats, self.buckets[day])
+        return window_stats
+
+    def report(self, file, today):
+        self.expire(today)
+        rolling_stats = {}
+        for name, days in self.windows.items():
+            window_stats = self.window(days, today)
+            if window_stats:
+                window_stats = detailed_counts_as_dicts(window_stats)
+            window_stats['since'] = datetime.combine(today - timedelta(days=days - 1), datetime.min.time()).strftime(TIME_FORMAT)
+            rolling_stats[name] = window_stats
+        os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+        with open(file + '.tmp', 'w') as outfile:
+            json.dump(rolling_stats, outfile, indent=4, sort_keys=True, default=json_default)
+        os.replace(file + '.tmp', file)
+
+def poll_dmp_file(dmp_file, last_stat):
+    '''(size, mtime) of a stats.dmp file and whether it is complete: unchanged since last_stat and all its blocks parse'''
+    try:
+        st = os.stat(dmp_file)
+    except OSError:
+        return None, False
+    stat = (st.st_size, st.st_mtime_ns)
+    if stat != last_stat:
+        return stat, False
+    try:
+        with open(dmp_file, 'rb') as f:
+            statparser.parse_stats_buffer(f.read())
+    except (OSError, ValueError, IndexError):
+        #a game can stop writing at a block boundary for a moment, only a parse of the last block tells
+        return stat, False
+    return stat, True
+
+def get_dmp_sources(dmp_files):
+    '''(source, path) of each stats.dmp file given by path or glob, the source is the name of its game install folder'''
+    paths = []
+    for dmp_file in dmp_files:
+        for path in [dmp_file] if os.path.isfile(dmp_file) else sorted(glob.glob(dmp_file)):
+            path = os.path.abspath(path)
+            if path not in paths:
+                paths.append(path)
+    names = [os.path.basename(os.path.dirname(path)) for path in paths]
+    #the whole folder where install folder names clash
+    return [(name if names.count(name) == 1 else os.path.dirname(path), path) for name, path in zip(names, paths)]
+
+class DmpSource(watchdog.events.PatternMatchingEventHandler):
+    '''One watched stats.dmp file of a game install. Watchdog callbacks only wake up ready_games on the event loop'''
+    def __init__(self, loop, source, dmp_file):
+        self.loop = loop
+        self.source = source
+        self.dmp_file = dmp_file
+        self.events = asyncio.Queue(MAX_PENDING_DMP_EVENTS)
+
+        watchdog.events.PatternMatchingEventHandler.__init__(self, patterns=['*'+ntpath.basename(dmp_file)+'*'])
+
+    async def ready_games(self, poll_interval_secs=DMP_POLL_INTERVAL_SECS, give_up_secs=DMP_GIVE_UP_SECS):
+        '''Collapses the bursts of events a game writing stats.dmp causes into one: yields the file once its size and
+        mtime stopped changing between two polls and all its blocks parse. A file which stops changing without ever
+        parsing is skipped after give_up_secs'''
+        while True:
+            await self.events.get()
+            first_event = time.monotonic()
+            events = 1
+            stat = None
+            stat_since = first_event
+            while True:
+                await asyncio.sleep(poll_interval_secs)
+                while not self.events.empty():
+                    self.events.get_nowait()
+                    events += 1
+                try:
+                    #off the event loop, the file may be locked by the game
+                    new_stat, ready = await asyncio.wait_for(self.loop.run_in_executor(None, poll_dmp_file, self.dmp_file, stat), give_up_secs)
+                except asyncio.TimeoutError:
+                    new_stat, ready = stat, False
+                now = time.monotonic()
+                if new_stat != stat:
+                    stat = new_stat
+                    stat_since = now
+                if ready:
+                    print_info("Detected a game in {} after {} events, {:.2f}s after the first one".format(self.dmp_file, events, now - first_event))
+                    yield self.dmp_file
+                    break
+                if now - stat_since >= give_up_secs:
+                    print_error("Skipping " + self.dmp_file + ", it stopped changing but could not be parsed")
+                    break
+
+    def do(self, event):
+        #called on the watchdog observer thread, which all sources share, so it never waits for a full queue
+        self.loop.call_soon_threadsafe(self.put_event, event.src_path)
+
+    def put_event(self, path):
+        try:
+            self.events.put_nowait(path)
+        except asyncio.QueueFull:
+            #ready_games polls the file itself once woken up, so a full queue loses nothing
+            pass
+
+    def on_created(self, event):
+        self.do(event)
+
+    def on_modified(self, event):
+        self.do(event)
+
+    def on_moved(self, event):
+        self.do(event)
+
+class StatsDmpWatcher:
+    '''Watches the stats.dmp files of several game installs on an asyncio event loop. Games are parsed on a thread
+    per source and aggregated and reported on a single stats thread, so aggregating and reporting never overlap and
+    games aggregated while a report is written share the next one. Back to back games are not held up by the reports
+    of the previous one, and a slow or locked file of one game install does not hold up the others'''
+    def __init__(self, ctx_obj, dmp_sources, start_time, use_php_parser=False):
         self.ctx_obj = ctx_obj
         self.config = ctx_obj['CONFIG']
         self.start_time = start_time
         self.processed_files = {}
+        self.seen_games = SeenGames(get_seen_games_file(self.config['gameStatsFolder']))
+        self.game_archive = get_game_archive(self.config)
+        self.game_index = get_game_index(self.config)
         self.session_stats = {}
+        self.session_renderer = StatsRenderer()
+        self.overall_renderer = StatsRenderer()
+        self.overall_checkpoint = None
         self.overall_stats = self.load_overall_stats()
-        self.last_notification_time = None
+        self.overall_epoch_time = None
+        self.rolling_stats = RollingStats(self.config, self.config.get('rollingWindows', DEFAULT_ROLLING_WINDOWS))
+        self.rolling_stats.seed(date.today())
+        self.rolling_stats.report(get_rolling_stats_json_file(self.config['overallStatsFolder']), date.today())
         self.use_php_parser = use_php_parser
 
-        watchdog.events.PatternMatchingEventHandler.__init__(self, patterns=['*'+dmp_file+'*'])
+        self.dmp_sources = dmp_sources
+        self.unreported_games = 0
+        #the parsers of all sources share the seen games, archive and index, and the games being stored
+        self.store_lock = threading.Lock()
+        self.storing_games = set()
+        #reports are published to it as they are written, see report_aggregated_stats
+        self.web_server = None
+        self.parse_executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(dmp_sources), thread_name_prefix='parser')
+        self.stats_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='stats')
 
     def load_overall_stats(self):
         file = get_overall_stats_json_file(self.config['overallStatsFolder'])
-        with open(file, 'r') as f:
+        try:
+            data, self.overall_checkpoint = load_overall_stats_checkpoint(self.config)
+            #aliases added since are written with the next game
+            reattribute_player_aliases(self.config, data)
+            return data
+        except ValueError as e:
+            print_error(file + " could not be parsed")
+            print_error(e)
+
+    async def watch_source(self, dmp_source):
+        loop = asyncio.get_running_loop()
+        async for dmp_file in dmp_source.ready_games():
             try:
-                data = json.load(f)
-                return data
+                parse = loop.run_in_executor(self.parse_executor, self.parse, dmp_file, dmp_source.source)
+                try:
+                    parsed_game = await asyncio.wait_for(asyncio.shield(parse), PARSE_TIMEOUT_SECS)
+                except asyncio.TimeoutError:
+                    #its thread can not be stopped, so it is waited for: a source has at most one parse in flight
+                    print_error("Parsing " + dmp_file + " timed out, waiting for it before the next game")
+                    parsed_game = await parse
+                if parsed_game != None and await loop.run_in_executor(self.stats_executor, self.aggregate, parsed_game) != None:
+                    self.reports_pending.set()
             except Exception as e:
-                print_error(file + " could not be parsed")
-                print_error(e)
-
-    def do(self, event):
-        time_now = datetime.now()
-        if self.last_notification_time != None:
-            #ignore - watchdog bug causing repeat events for the same file update)
-            if (time_now-self.last_notification_time).total_seconds() < 10:
-                return
-
-        self.last_notification_time = time_now
+                print_error("Could not process " + dmp_file + ": " + str(e))
 
+    async def write_reports(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.reports_pending.wait()
+            self.reports_pending.clear()
+            try:
+                await loop.run_in_executor(self.stats_executor, self.report)
+            except Exception as e:
+                print_error("Could not write the stats reports: " + str(e))
+
+    async def run(self, start_web_server=False, open_browser=False):
+        '''Watch until cancelled (e.g. by ctrl+C), then report the games aggregated but not reported so far'''
+        loop = asyncio.get_running_loop()
+        self.reports_pending = asyncio.Event()
+        dmp_sources = [DmpSource(loop, source, dmp_file) for source, dmp_file in self.dmp_sources]
+        observer = watchdog.observers.Observer()
+        for dmp_source in dmp_sources:
+            print_info("Watching for changes to: " + dmp_source.dmp_file + " (" + dmp_source.source + ")")
+            observer.schedule(dmp_source, path=os.path.dirname(dmp_source.dmp_file), recursive=False)
+
+        tasks = []
+        try:
+            #inside the try, so the observer and executors are shut down if e.g. the web server's port is taken
+            observer.start()
+            if start_web_server:
+                self.web_server = await start_web_reporter(self.config['sessionStatsFolder'], self.start_time, open_browser)
+
+            tasks = [asyncio.ensure_future(self.watch_source(dmp_source)) for dmp_source in dmp_sources]
+            tasks.append(asyncio.ensure_future(self.write_reports()))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            observer.stop()
+            if observer.is_alive():
+                await loop.run_in_executor(None, observer.join)
+            if self.web_server != None:
+                await self.web_server.close()
+                self.web_server = None
+            #queued after whatever the stats thread is still doing
+            await loop.run_in_executor(self.stats_executor, self.report_unreported)
+            self.parse_executor.shutdown(wait=False)
+            self.stats_executor.shutdown()
+
+    def parse(self, dmp_file, source):
+        #cheap check on the game's start time and player names only, before any parsing and writing
+        fingerprint = statparser.fingerprint_stats(dmp_file)
+        with self.store_lock:
+            if fingerprint in self.seen_games or fingerprint in self.storing_games:
+                print_info("Skipping already processed game in " + dmp_file)
+                return None
+            #claimed, so the same game showing up in another source meanwhile is skipped too
+            self.storing_games.add(fingerprint)
+        try:
+            parsed_game = self.store(dmp_file, source, fingerprint)
+        finally:
+            with self.store_lock:
+                self.storing_games.discard(fingerprint)
+        if parsed_game != None:
+            print_info("Parsed a game of " + source + ": " + parsed_game[0])
+        return parsed_game
+
+    def store(self, dmp_file, source, fingerprint):
+        #parsing, writing and statparser.php run outside of store_lock, so sources do not wait for each other's games
+        data = None
+        dmp = None
         if self.use_php_parser:
-            gamestats = call_stat_dmp_parser(self.config, event.src_path)
+            gamestats = call_stat_dmp_parser(self.config, dmp_file)
+            if gamestats:
+                data = gameindex.read_parsed_game(gamestats)
+        elif self.game_archive is not None:
+            data, dmp = archive.read_stats(dmp_file, self.config["thisPlayerName"], source)
+            gamestats = get_archived_game_key(self.config['gameArchiveFolder'], data['gameReport']['epoch_time'])
         else:
             gamestats = statparser.process_stats(
-                event.src_path,
+                dmp_file,
                 self.config["gameStatsFolder"],
                 self.config["thisPlayerName"],
+                None,
+                source,
             )
-       
-        if gamestats not in self.processed_files:
-            print_special("Aggregating SESSION stats from parsed game stats: " + gamestats)
-            aggregate_game_stats(self.config, self.session_stats, gamestats, self.start_time)
-            print_special("Aggregating OVERALL stats from parsed game stats: " + gamestats)
-            aggregate_game_stats(self.config, self.overall_stats, gamestats, self.start_time)
-            
-            session_stats_json = get_session_stats_json_file(self.config['sessionStatsFolder'], self.start_time)
-            session_stats_html = get_session_stats_html_file(self.config['sessionStatsFolder'], self.start_time)
-            report_aggregated_stats(self.session_stats, session_stats_json, session_stats_html, self.start_time, self.config['htmlTemplateSessions'], self.config['htmlResourcesRelPathSessions'])
-
-            overall_stats_json = get_overall_stats_json_file(self.config['overallStatsFolder'])
-            overall_stats_html = get_overall_stats_html_file(self.config['overallStatsFolder'])
-            for game_history in self.overall_stats['game_history']:
-                if 'relative_start_time' in game_history:
-                    del game_history['relative_start_time']
-            report_aggregated_stats(self.overall_stats, overall_stats_json, overall_stats_html, self.start_time, self.config['htmlTemplateOverall'], self.config['htmlResourcesRelPathOverall'])
-
-            if self.config['write_xsplit_xml']:
-                write_xsplit_xml(self.config, self.session_stats)
-
-            self.ctx_obj['num_games'] += 1
-            self.processed_files[gamestats] = {}
-
-    def on_created(self, event):
-        self.do(event)
-
-    def on_modified(self, event):
-        self.do(event)
-
-    def on_moved(self, event):
-        self.do(event)
-
-def aggregate_game_stats_multi(config, since_when):
-    aggregated_stats = {}
-    processed_files = {}
-    earliest_ts = None
+            #written by this thread just now, no need to retry
+            data = gameindex.read_parsed_game(gamestats)
+
+        if data == None:
+            #not seen either, so the game is parsed again on the next change of its file
+            return None
+        with self.store_lock:
+            if dmp != None:
+                self.game_archive.append(data, dmp)
+            elif self.game_index is not None:
+                self.game_index.add_game(data, gamestats)
+            self.seen_games.add(fingerprint)
+
+        if dmp == None and gamestats in self.processed_files:
+            return None
+        game = records.GameRecord.from_dict(data)
+        #statparser.php does not know the source
+        game.report.setdefault('source', source)
+        return gamestats, game
+
+    def aggregate(self, parsed_game):
+        gamestats, game = parsed_game
+        if gamestats in self.processed_files:
+            return None
+        print_special("Aggregating SESSION stats from parsed game stats: " + gamestats)
+        aggregate_game_record(self.config, self.session_stats, game, self.start_time)
+        print_special("Aggregating OVERALL stats from parsed game stats: " + gamestats)
+        aggregate_game_record(self.config, self.overall_stats, game, self.start_time)
+        #only the entry just added has a relative start time
+        strip_relative_start_time(self.overall_stats, game.epoch_time)
+        self.overall_epoch_time = max(self.overall_epoch_time or game.epoch_time, game.epoch_time)
+        self.rolling_stats.add(game)
+        self.unreported_games += 1
+
+        self.ctx_obj['num_games'] += 1
+        self.processed_files[gamestats] = {}
+        return gamestats
+
+    def report_unreported(self):
+        if self.unreported_games:
+            self.report()
+
+    def report(self):
+        #reports the stats of all the games aggregated so far
+        self.unreported_games = 0
+        session_stats_json = get_session_stats_json_file(self.config['sessionStatsFolder'], self.start_time)
+        session_stats_html = get_session_stats_html_file(self.config['sessionStatsFolder'], self.start_time)
+        report_aggregated_stats(self.session_stats, session_stats_json, session_stats_html, self.start_time, self.config['htmlTemplateSessions'], self.config['htmlResourcesRelPathSessions'], self.session_renderer, self.web_server)
+
+        overall_stats_json = get_overall_stats_json_file(self.config['overallStatsFolder'])
+        overall_stats_html = get_overall_stats_html_file(self.config['overallStatsFolder'])
+        report_aggregated_stats(self.overall_stats, overall_stats_json, overall_stats_html, self.start_time, self.config['htmlTemplateOverall'], self.config['htmlResourcesRelPathOverall'], self.overall_renderer, self.web_server)
+        #keep the checkpoint in step, so update-overall-stats does not fold these games in twice
+        if self.overall_checkpoint != None:
+            self.overall_checkpoint = save_overall_stats_checkpoint(self.config, self.overall_checkpoint['start_time'],
+                max(self.overall_checkpoint['epoch_time'], self.overall_epoch_time))
+
+        self.rolling_stats.report(get_rolling_stats_json_file(self.config['overallStatsFolder']), date.today())
+
+        if self.config['write_xsplit_xml']:
+            write_xsplit_xml(self.config, self.session_stats)
+
+def list_games(config, since_when, until_when=None, index_filters=None):
+    '''(epoch time, path or archive key) of the games started after since_when and at or before until_when, in time order.
+    index_filters are only applied in index mode, see gameindex.GameIndex.iter_games'''
+    since = int(since_when.timestamp()) if since_when != None else None
+    until = int(until_when.timestamp()) if until_when != None else None
+    game_archive = get_game_archive(config)
+    if game_archive is not None:
+        #range query on the archive index
+        return [(epoch_time, get_archived_game_key(config['gameArchiveFolder'], epoch_time))
+                for epoch_time in game_archive.epoch_times(since=since, until=until)]
+
+    game_index = get_game_index(config)
+    if game_index is not None:
+        #range scan on the index, only the matching games are opened later
+        with game_index:
+            return [(game.epoch_time, game.path) for game in game_index.iter_games(since=since, until=until, **(index_filters or {}))]
 
     path = config['gameStatsFolder']
     allfiles =  [y for x in os.walk(path) for y in glob.glob(os.path.join(x[0], '*_parsed.json'))]
 
+    games = []
     for file_path in allfiles:
         file = ntpath.basename(file_path)
         filets = file.split("_")[0]
         try:
-            filets = datetime.fromtimestamp(int(filets))
+            filets = int(filets)
         except:
             continue
 
-        if filets > since_when:
-            print_special("Aggregating SESSION/OVERALL stats from parsed game stats: " + file_path)
-            aggregate_game_stats(config, aggregated_stats, file_path, since_when)
-            processed_files[file_path] = {}
-            if earliest_ts == None:
-                earliest_ts = filets
-    return (aggregated_stats, processed_files, earliest_ts)
-
-def resolve_player_aliases(player_aliases, name):
-    for aliases in player_aliases:
-        if name in aliases:
-            return aliases[0]
-    return name
-
-def aggregate_game_overall_stats(aggregated_stats, data):
+        if (since == None or filets > since) and (until == None or filets <= until):
+            games.append((filets, file_path))
+    games.sort()
+    return games
+
+def game_matches(config, game, player=None, map_=None, side=None, result=None, min_duration=None, max_duration=None):
+    '''Whether a GameRecord matches the filters, player filters have to match the same player'''
+    if map_ != None and game.map != map_:
+        return False
+    if min_duration != None and game.duration < min_duration:
+        return False
+    if max_duration != None and game.duration > max_duration:
+        return False
+    if player == None and side == None and result == None:
+        return True
+    for game_player in game.players:
+        if player != None and get_player_registry(config).resolve(game_player.name) != get_player_registry(config).resolve(player):
+            continue
+        if side != None and game_player.side != side:
+            continue
+        if result != None and gameindex.player_result({r: getattr(game_player, r) for r in gameindex.PLAYER_RESULTS}) != result:
+            continue
+        return True
+    return False
+
+def iter_matching_games(config, since_when, until_when, **filters):
+    '''Prettified stats of the games matching the filters of game_matches, in time order. Filters are applied
+    before any game stats are read where possible: all of them in index mode, the time range otherwise'''
+    game_archive = get_game_archive(config)
+    if game_archive is not None:
+        for data in game_archive.iter_stats(since=int(since_when.timestamp()) if since_when != None else None,
+                                            until=int(until_when.timestamp()) if until_when != None else None):
+            if game_matches(config, records.GameRecord.from_dict(data), **filters):
+                yield data
+        return
+
+    index_filters = {
+        'names': [get_player_registry(config).resolve(filters['player'])] if filters.get('player') != None else None,
+        'resolve_name': get_player_registry(config).resolve,
+        'side': filters.get('side'),
+        'result': filters.get('result'),
+        'map_': filters.get('map_'),
+        'min_duration': filters.get('min_duration'),
+        'max_duration': filters.get('max_duration')
+    }
+    for epoch_time, file_path in list_games(config, since_when, until_when, index_filters):
+        try:
+            data = gameindex.read_parsed_game(file_path)
+        except (OSError, ValueError) as e:
+            print_error(file_path + " could not be parsed: " + str(e))
+            continue
+        if game_matches(config, records.GameRecord.from_dict(data), **filters):
+            yield data
+
+def get_aggregate_cache_file(gameStatsFolder, month):
+    return gameStatsFolder + '/aggregate_cache/' + month + "_aggregated_stats.json"
+
+def _shard_signature(config, games):
+    #a cached shard is valid for the same games, unchanged since, and the same aliases
+    files = [(key, os.path.getmtime(key) if os.path.isfile(key) else None) for epoch_time, key in games]
+    return hashlib.sha1(json.dumps([AGGREGATE_CACHE_VERSION, config['playerAliases'], config.get('playerClanTagPatterns'), files]).encode('utf-8')).hexdigest()
+
+def _load_aggregate_shard(cache_file, signature):
+    try:
+        with open(cache_file, 'r') as f:
+            shard = json.load(f)
+        if shard['signature'] == signature:
+            return shard['stats'], shard['epoch_times']
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def _save_aggregate_shard(cache_file, signature, aggregated_stats, epoch_times):
+    os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+    shard = {
+        "signature": signature,
+        "stats": detailed_counts_as_dicts(aggregated_stats) if aggregated_stats else {},
+        "epoch_times": epoch_times
+    }
+    with open(cache_file + '.tmp', 'w') as outfile:
+        json.dump(shard, outfile, default=json_default)
+    os.replace(cache_file + '.tmp', cache_file)
+
+def _aggregate_shard(config, since_when, games):
+    #map step, may run in a worker process: aggregate a shard of games in time order
+    aggregated_stats = {}
+    epoch_times = []
+    game_archive = get_game_archive(config)
+    if game_archive is not None:
+        for data in game_archive.iter_stats(since=games[0][0] - 1, until=games[-1][0]):
+            game = records.GameRecord.from_dict(data)
+            game_key = get_archived_game_key(config['gameArchiveFolder'], game.epoch_time)
+            print_special("Aggregating SESSION/OVERALL stats from archived game stats: " + game_key)
+            aggregate_game_record(config, aggregated_stats, game, since_when)
+            epoch_times.append(game.epoch_time)
+        return aggregated_stats, epoch_times
+
+    for epoch_time, file_path in games:
+        print_special("Aggregating SESSION/OVERALL stats from parsed game stats: " + file_path)
+        game = load_game_record(file_path)
+        if game is not None:
+            aggregate_game_record(config, aggregated_stats, game, since_when)
+            epoch_times.append(game.epoch_time)
+    return aggregated_stats, epoch_times
+
+def aggregate_game_stats_multi(config, since_when, aggregated_stats=None, jobs=None):
+    if aggregated_stats == None:
+        aggregated_stats = {}
+    games = list_games(config, since_when)
+    processed_files = {key: {} for epoch_time, key in games}
+    earliest_ts = datetime.fromtimestamp(games[0][0]) if games else None
+    latest_ts = datetime.fromtimestamp(games[-1][0]) if games else None
+
+    #one shard per month, months after since_when are complete and their aggregates are cached
+    shards = collections.OrderedDict()
+    for epoch_time, key in games:
+        shards.setdefault(datetime.fromtimestamp(epoch_time).strftime('%Y-%m'), []).append((epoch_time, key))
+
+    results = {}
+    pending = []
+    for month, shard in shards.items():
+        if datetime.strptime(month, '%Y-%m') > since_when:
+            signature = _shard_signature(config, shard)
+            results[month] = _load_aggregate_shard(get_aggregate_cache_file(config['gameStatsFolder'], month), signature)
+            if results[month] != None:
+                print_special("Using cached aggregate of {} games in {}".format(len(shard), month))
+                continue
+        pending.append(month)
+
+    if len(pending) > 1 and jobs != 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            pending_results = executor.map(_aggregate_shard, *zip(*[(config, since_when, shards[month]) for month in pending]))
+            results.update(zip(pending, pending_results))
+    else:
+        for month in pending:
+            results[month] = _aggregate_shard(config, since_when, shards[month])
+
+    #reduce step, in time order so the game history stays sorted
+    for month, shard in shards.items():
+        shard_stats, epoch_times = results[month]
+        if 'game_history' in shard_stats and not isinstance(shard_stats['game_history'], GameHistory):
+            #cached shard
+            shard_stats['game_history'] = GameHistory(shard_stats['game_history'], epoch_times)
+        if month in pending and datetime.strptime(month, '%Y-%m') > since_when:
+            _save_aggregate_shard(get_aggregate_cache_file(config['gameStatsFolder'], month),
+                _shard_signature(config, shard), shard_stats, epoch_times)
+        for game_history, epoch_time in zip(shard_stats.get('game_history', []), epoch_times):
+            game_history['relative_start_time'] = _relative_start_time(epoch_time, since_when)
+        merge_aggregated_stats(aggregated_stats, shard_stats)
+    return (aggregated_stats, processed_files, earliest_ts, latest_ts)
+
+def merge_aggregated_stats(aggregated_stats, other):
+    '''Merge the aggregate of later games into aggregated_stats. Associative with {} as identity,
+    so aggregates of shards of games can be merged in any grouping as long as their time order is kept'''
+    if not other:
+        return aggregated_stats
+    aggregated_stats['games_played'] = aggregated_stats.get('games_played', 0) + other['games_played']
+
+    if 'maps_played' not in aggregated_stats:
+        aggregated_stats['maps_played'] = []
+    for map_ in other['maps_played']:
+        if map_ not in aggregated_stats['maps_played']:
+            aggregated_stats['maps_played'].append(map_)
+
+    aggregated_stats['total_duration_secs'] = aggregated_stats.get('total_duration_secs', 0) + other['total_duration_secs']
+    aggregated_stats['total_duration'] = str(timedelta(seconds=aggregated_stats['total_duration_secs']))
+
+    for source, games in other.get('games_by_source', {}).items():
+        if 'games_by_source' not in aggregated_stats:
+            aggregated_stats['games_by_source'] = {}
+        aggregated_stats['games_by_source'][source] = aggregated_stats['games_by_source'].get(source, 0) + games
+
+    get_game_history(aggregated_stats).extend(other['game_history'])
+
+    if 'player_stats' not in aggregated_stats:
+        aggregated_stats['player_stats'] = {}
+    for name, other_player_stats in other['player_stats'].items():
+        if name not in aggregated_stats['player_stats']:
+            aggregated_stats['player_stats'][name] = new_player_stats()
+        merge_player_stats(aggregated_stats['player_stats'][name], other_player_stats)
+
+    for key in ['head_to_head', 'head_to_head_sides']:
+        if key not in aggregated_stats:
+            aggregated_stats[key] = {}
+        merge_head_to_head(aggregated_stats[key], other.get(key, {}))
+    return aggregated_stats
+
+def merge_player_stats(player_stats, other):
+    for key in ['games_played', 'funds_left', 'disconnections', 'no_completions', 'quits', 'wins', 'draws', 'defeats']:
+        player_stats[key] += other[key]
+    player_stats['funds_left_avg'] = player_stats['funds_left'] / player_stats['games_played']
+
+    for side, count in other['sides'].items():
+        if side not in player_stats['sides']:
+            player_stats['sides'][side] = 0
+        player_stats['sides'][side] += count
+
+    for heap in mappings.HUMAN_READABLE_COUNTABLES.values():
+        if heap in other:
+            if heap not in player_stats:
+                player_stats[heap] = 0
+            player_stats[heap] += other[heap]
+        if heap in other['detailed_counts']:
+            if heap not in player_stats['detailed_counts']:
+                player_stats['detailed_counts'][heap] = {}
+            add_detailed_counts(player_stats['detailed_counts'], heap, other['detailed_counts'][heap])
+
+def get_player_registry(config):
+    '''Registry of the playerAliases and playerClanTagPatterns, built once per config'''
+    if '_playerRegistry' not in config:
+        config['_playerRegistry'] = players.PlayerRegistry(config['playerAliases'] or [], config.get('playerClanTagPatterns') or [])
+    return config['_playerRegistry']
+
+def reattribute_player_aliases(config, aggregated_stats):
+    '''Resolve the player names of saved aggregated stats again, merging the stats of names which became aliases
+    of the same player since. Returns the number of renamed players'''
+    registry = get_player_registry(config)
+    renamed = set()
+
+    player_stats = {}
+    for name, stats in aggregated_stats.get('player_stats', {}).items():
+        resolved = registry.resolve(name)
+        if resolved != name:
+            renamed.add(name)
+        if resolved in player_stats:
+            merge_player_stats(player_stats[resolved], stats)
+        else:
+            player_stats[resolved] = stats
+    if not renamed:
+        #the names of the game history and head to head matrix are the same
+        return 0
+    aggregated_stats['player_stats'] = player_stats
+
+    for game_history in aggregated_stats.get('game_history', []):
+        game_history['players'] = [registry.resolve(name) + '/' + side
+                                   for name, side in (player.rsplit('/', 1) for player in game_history['players'])]
+        if game_history['winner'] != 'AI':
+            game_history['winner'] = registry.resolve(game_history['winner'])
+
+    if 'head_to_head' in aggregated_stats:
+        head_to_head = {}
+        for name, opponents in aggregated_stats['head_to_head'].items():
+            for opponent, wins_losses in opponents.items():
+                merge_head_to_head(head_to_head, {registry.resolve(name): {registry.resolve(opponent): wins_losses}})
+        aggregated_stats['head_to_head'] = head_to_head
+    return len(renamed)
+
+def aggregate_game_overall_stats(aggregated_stats, game):
     if 'games_played' not in aggregated_stats:
         aggregated_stats['games_played'] = 0
     aggregated_stats['games_played'] += 1
@@ -224,111 +947,125 @@ def aggregate_game_overall_stats(aggregated_stats, data):
     if 'maps_played' not in aggregated_stats:
         aggregated_stats['maps_played'] = []
 
-    if data['gameReport']['map'] not in aggregated_stats['maps_played']:
-        aggregated_stats['maps_played'].append(data['gameReport']['map'])
+    if game.map not in aggregated_stats['maps_played']:
+        aggregated_stats['maps_played'].append(game.map)
 
     if 'total_duration' not in aggregated_stats:
         aggregated_stats['total_duration_secs'] = 0
 
-    aggregated_stats['total_duration_secs'] += data['gameReport']['duration']
+    aggregated_stats['total_duration_secs'] += game.duration
     aggregated_stats['total_duration'] = str(timedelta(seconds=aggregated_stats['total_duration_secs']))
 
-def resolve_player_stats(data):
-    playerStats = {}
-    if isinstance(data['playerStats'], list):
-        i = 0
-        for stats in data['playerStats']:
-            playerStats[i] = stats
-            i += 1
-    else:
-        playerStats = data['playerStats']
+    #games recorded by the stat watcher are tagged with the game install they were played on
+    if 'source' in game.report:
+        if 'games_by_source' not in aggregated_stats:
+            aggregated_stats['games_by_source'] = {}
+        aggregated_stats['games_by_source'][game.report['source']] = aggregated_stats['games_by_source'].get(game.report['source'], 0) + 1
+
+def new_player_stats():
+    return {
+            "games_played": 0,
+            "funds_left": 0,
+            "funds_left_avg": 0,
+            "disconnections": 0,
+            "no_completions": 0,
+            "quits": 0,
+            "wins": 0,
+            "draws": 0,
+            "defeats": 0,
+            "sides": {},
+            "detailed_counts": {
+            }
+        }
+
+def add_detailed_counts(aggregated_counts, heap, counts):
+    #counts decoded to arrays are summed by a single array addition. Counts kept as dicts because of type names
+    #unknown to mappings (e.g. games from before a rename) can not be aligned, those are summed as dicts
+    aggregated = aggregated_counts[heap]
+    if isinstance(counts, statparser.Countables):
+        if isinstance(aggregated, statparser.Countables) or statparser.Countables.can_align(counts.prefix, aggregated):
+            if not isinstance(aggregated, statparser.Countables):
+                aggregated_counts[heap] = statparser.Countables.from_dict(counts.prefix, aggregated)
+            aggregated_counts[heap] += counts
+            return
+        counts = counts.as_dict()
+    elif isinstance(aggregated, statparser.Countables):
+        if statparser.Countables.can_align(aggregated.prefix, counts):
+            aggregated_counts[heap] += statparser.Countables.from_dict(aggregated.prefix, counts)
+            return
+        aggregated_counts[heap] = aggregated.as_dict()
 
-    return playerStats
+    for _type, count in counts.items():
+        if _type not in aggregated_counts[heap]:
+            aggregated_counts[heap][_type] = 0
 
-def aggregate_game_player_stats(config, aggregated_stats, data):
+        aggregated_counts[heap][_type] += count
+
+def aggregate_game_player_stats(config, aggregated_stats, game):
     if 'player_stats' not in aggregated_stats:
         aggregated_stats['player_stats'] = {}
 
-    playerStats = resolve_player_stats(data)
-
-    for i, stats in playerStats.items():
-        name = resolve_player_aliases(config['playerAliases'], stats['name'])
+    for player in game.players:
+        name = get_player_registry(config).resolve(player.name)
 
         if name not in aggregated_stats['player_stats']:
-            aggregated_stats['player_stats'][name] = {
-                    "games_played": 0,
-                    "funds_left": 0,
-                    "funds_left_avg": 0,
-                    "disconnections": 0,
-                    "no_completions": 0,
-                    "quits": 0,
-                    "wins": 0,
-                    "draws": 0,
-                    "defeats": 0,
-                    "sides": {},
-                    "detailed_counts": {
-                    }
-                }
+            aggregated_stats['player_stats'][name] = new_player_stats()
 
         for heap in mappings.HUMAN_READABLE_COUNTABLES.values():
-            aggregated_stats['player_stats'][name]['detailed_counts'][heap] = {}
+            if heap not in aggregated_stats['player_stats'][name]['detailed_counts']:
+                aggregated_stats['player_stats'][name]['detailed_counts'][heap] = {}
 
         aggregated_stats['player_stats'][name]['games_played'] += 1
-        aggregated_stats['player_stats'][name]['funds_left'] += stats['funds_left']
+        aggregated_stats['player_stats'][name]['funds_left'] += player.funds_left
         aggregated_stats['player_stats'][name]['funds_left_avg'] = aggregated_stats['player_stats'][name]['funds_left'] / aggregated_stats['player_stats'][name]['games_played']
-        aggregated_stats['player_stats'][name]['disconnections'] += 1 if stats['disconnected'] else 0
-        aggregated_stats['player_stats'][name]['no_completions'] += 1 if stats['no_completion'] else 0
-        aggregated_stats['player_stats'][name]['quits'] += 1 if stats['quit'] else 0
-        aggregated_stats['player_stats'][name]['wins'] += 1 if stats['won'] else 0
-        aggregated_stats['player_stats'][name]['draws'] += 1 if stats['draw'] else 0
-        aggregated_stats['player_stats'][name]['defeats'] += 1 if stats['defeated'] else 0
+        aggregated_stats['player_stats'][name]['disconnections'] += 1 if player.disconnected else 0
+        aggregated_stats['player_stats'][name]['no_completions'] += 1 if player.no_completion else 0
+        aggregated_stats['player_stats'][name]['quits'] += 1 if player.quit else 0
+        aggregated_stats['player_stats'][name]['wins'] += 1 if player.won else 0
+        aggregated_stats['player_stats'][name]['draws'] += 1 if player.draw else 0
+        aggregated_stats['player_stats'][name]['defeats'] += 1 if player.defeated else 0
 
-        if stats['side'] not in aggregated_stats['player_stats'][name]['sides']:
-            aggregated_stats['player_stats'][name]['sides'][stats['side']] = 0
+        if player.side not in aggregated_stats['player_stats'][name]['sides']:
+            aggregated_stats['player_stats'][name]['sides'][player.side] = 0
 
-        aggregated_stats['player_stats'][name]['sides'][stats['side']] += 1
+        aggregated_stats['player_stats'][name]['sides'][player.side] += 1
 
         for heap in mappings.HUMAN_READABLE_COUNTABLES.values():
-            if heap in stats:
+            total = player.total(heap)
+            if total is not None:
                 if heap not in aggregated_stats['player_stats'][name]:
                     aggregated_stats['player_stats'][name][heap] = 0
-                aggregated_stats['player_stats'][name][heap] += stats[heap]
-            if heap in stats['detailed_counts']:
-                for _type, count in stats['detailed_counts'][heap].items():
-                    if _type not in aggregated_stats['player_stats'][name]['detailed_counts'][heap]:
-                        aggregated_stats['player_stats'][name]['detailed_counts'][heap][_type] = 0
+                aggregated_stats['player_stats'][name][heap] += total
+            if player.detailed_counts and heap in player.detailed_counts:
+                add_detailed_counts(aggregated_stats['player_stats'][name]['detailed_counts'], heap, player.detailed_counts[heap])
 
-                    aggregated_stats['player_stats'][name]['detailed_counts'][heap][_type] += stats['detailed_counts'][heap][_type]
+def _relative_start_time(epoch_time, start_time):
+    relative_start_time = epoch_time - start_time.timestamp()
+    if relative_start_time < 0:
+        return '-'+str(timedelta(seconds=int(abs(relative_start_time))))
+    return str(timedelta(seconds=int(abs(relative_start_time))))
 
-def aggregate_game_history(config, aggregated_stats, data, start_time):
-    if 'game_history' not in aggregated_stats:
-            aggregated_stats['game_history'] = []
+def aggregate_game_history(config, aggregated_stats, game, start_time):
 
-    relative_start_time = data['gameReport']['epoch_time'] - start_time.timestamp()
-    if relative_start_time < 0:
-        relative_start_time = '-'+str(timedelta(seconds=int(abs(relative_start_time))))
-    else:
-        relative_start_time = str(timedelta(seconds=int(abs(relative_start_time))))
+    relative_start_time = _relative_start_time(game.epoch_time, start_time)
 
     game_history = {
-        "map": data['gameReport']['map'],
+        "map": game.map,
         "players": [],
-        "duration": str(timedelta(seconds=data['gameReport']['duration'])),
-        "start_time": datetime.fromtimestamp(data['gameReport']['epoch_time']).strftime(TIME_FORMAT),
+        "duration": str(timedelta(seconds=game.duration)),
+        "start_time": datetime.fromtimestamp(game.epoch_time).strftime(TIME_FORMAT),
         "relative_start_time": relative_start_time
     }
 
-    playerStats = resolve_player_stats(data)
-
     winner = "AI"
-    for i, stats in playerStats.items():
-        name = resolve_player_aliases(config['playerAliases'], stats['name'])
-        if stats['won']:
+    for player in game.players:
+        name = get_player_registry(config).resolve(player.name)
+        if player.won:
             winner = name
-        game_history['players'].append(name + "/" + stats['side'])
+        game_history['players'].append(name + "/" + player.side)
 
     game_history['winner'] = winner
-    aggregated_stats['game_history'].append(game_history)
+    get_game_history(aggregated_stats).add(game_history, game.epoch_time)
 
 def retryable_file_open(file, max_times = 5, times = 0):
     f = None
@@ -342,7 +1079,7 @@ def retryable_file_open(file, max_times = 5, times = 0):
             return retryable_file_open(file, max_times = max_times, times = times + 1)
     return f
 
-def aggregate_game_stats(config, aggregated_stats, file, start_time):
+def load_game_record(file):
     f = retryable_file_open(file)
     if f == None:
         print_error ("Could not open file even after retries. Unrecoverable")
@@ -354,12 +1091,62 @@ def aggregate_game_stats(config, aggregated_stats, file, start_time):
         except Exception as e:
             print_error(file + " could not be parsed")
             print_error(e)
-            return
+            return None
 
-        aggregate_game_overall_stats(aggregated_stats, data)
-        aggregate_game_history(config, aggregated_stats, data, start_time)
-        sorted(aggregated_stats['game_history'], key=lambda k: k['start_time']) 
-        aggregate_game_player_stats(config, aggregated_stats, data)
+    return records.GameRecord.from_dict(data)
+
+def aggregate_game_stats(config, aggregated_stats, file, start_time):
+    game = load_game_record(file)
+    if game is not None:
+        aggregate_game_record(config, aggregated_stats, game, start_time)
+
+def _add_head_to_head(matrix, winner, loser):
+    #compact [wins, losses] per pair, from the point of view of the first one
+    if winner not in matrix:
+        matrix[winner] = {}
+    if loser not in matrix:
+        matrix[loser] = {}
+    if loser not in matrix[winner]:
+        matrix[winner][loser] = [0, 0]
+    if winner not in matrix[loser]:
+        matrix[loser][winner] = [0, 0]
+    matrix[winner][loser][0] += 1
+    matrix[loser][winner][1] += 1
+
+def aggregate_game_head_to_head(config, aggregated_stats, game):
+    #every winner beat every other player who did not win, draws and spectators are not counted
+    if 'head_to_head' not in aggregated_stats:
+        aggregated_stats['head_to_head'] = {}
+    if 'head_to_head_sides' not in aggregated_stats:
+        aggregated_stats['head_to_head_sides'] = {}
+
+    players = [player for player in game.players if not player.spectator]
+    for winner in players:
+        if not winner.won:
+            continue
+        for loser in players:
+            if loser.won or loser.draw:
+                continue
+            _add_head_to_head(aggregated_stats['head_to_head'],
+                get_player_registry(config).resolve(winner.name),
+                get_player_registry(config).resolve(loser.name))
+            _add_head_to_head(aggregated_stats['head_to_head_sides'], winner.side, loser.side)
+
+def merge_head_to_head(matrix, other):
+    for name, opponents in other.items():
+        if name not in matrix:
+            matrix[name] = {}
+        for opponent, (wins, losses) in opponents.items():
+            if opponent not in matrix[name]:
+                matrix[name][opponent] = [0, 0]
+            matrix[name][opponent][0] += wins
+            matrix[name][opponent][1] += losses
+
+def aggregate_game_record(config, aggregated_stats, game, start_time):
+    aggregate_game_overall_stats(aggregated_stats, game)
+    aggregate_game_history(config, aggregated_stats, game, start_time)
+    aggregate_game_player_stats(config, aggregated_stats, game)
+    aggregate_game_head_to_head(config, aggregated_stats, game)
 
 def camel(snake_str):
     words = snake_str.split('_')
@@ -380,74 +1167,261 @@ def humanize(d, level = 1, start_level = -1, end_level = sys.maxsize):
     
     return r
 
-def report_aggregated_stats(aggregated_stats, aggregated_stats_json, aggregated_stats_html, start_time, template_html, htmlResourcesRelPath):
+def detailed_counts_as_dicts(aggregated_stats):
+    #shallow copy of aggregated_stats with array counts turned back into dicts for JSON and HTML
+    player_stats = {}
+    for name, stats in aggregated_stats['player_stats'].items():
+        if any(isinstance(counts, statparser.Countables) for counts in stats['detailed_counts'].values()):
+            stats = dict(stats, detailed_counts={
+                heap: counts.as_dict() if isinstance(counts, statparser.Countables) else counts
+                for heap, counts in stats['detailed_counts'].items()
+            })
+        player_stats[name] = stats
+    return dict(aggregated_stats, player_stats=player_stats)
+
+def _render_game_history_page(page, table_attributes):
+    return json2html.convert(json = humanize(page, start_level=2, end_level=2), table_attributes = table_attributes)
+
+def split_table_rows(table_html):
+    '''(head, rows) html of a table converted by json2html, None if it has no thead and tbody'''
+    head, tbody, rows = table_html.partition('<tbody>')
+    if not tbody or '<thead>' not in head or not rows.endswith('</tbody></table>'):
+        return None
+    return head, rows[:-len('</tbody></table>')]
+
+def split_rows(rows_html):
+    '''html of each top level row of table rows html, rows of nested tables stay in their row'''
+    rows = []
+    depth = 0
+    for match in re.finditer(r'<(/?)tr\b[^>]*>', rows_html):
+        if not match.group(1):
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                rows.append(rows_html[start:match.end()])
+    return rows
+
+def render_game_history(game_history, table_attributes, render_page=_render_game_history_page):
+    #humanized and converted page by page, the rows of all pages are joined into one table
+    if not isinstance(game_history, GameHistory):
+        game_history = GameHistory(game_history)
+    head = None
+    rows = []
+    for page in game_history.pages():
+        page_table = split_table_rows(render_page(page, table_attributes))
+        if page_table == None or head not in (None, page_table[0]):
+            #entries with different keys are not rendered as rows of a single table
+            return json2html.convert(json = humanize(game_history.as_list(), start_level=2, end_level=2), table_attributes = table_attributes)
+        head = page_table[0]
+        rows.append(page_table[1])
+    if head == None:
+        return json2html.convert(json = [], table_attributes = table_attributes)
+    return head + '<tbody>' + ''.join(rows) + '</tbody></table>'
+
+def _render_player_row(name, stats, table_attributes):
+    table_html = json2html.convert(json = humanize({name: stats}, start_level=2, end_level=4), table_attributes = table_attributes)
+    return table_html[len('<table ' + table_attributes + '>'):-len('</table>')]
+
+def render_player_stats(player_stats, table_attributes, render_row=_render_player_row):
+    #converted player by player, same as converting them at once
+    if not player_stats:
+        return json2html.convert(json = {}, table_attributes = table_attributes)
+    return '<table ' + table_attributes + '>' + ''.join(render_row(name, stats, table_attributes) for name, stats in player_stats.items()) + '</table>'
+
+def render_head_to_head(matrix, table_attributes):
+    #rows beat columns, cells are wins-losses, most active first
+    names = sorted(matrix, key=lambda name: -sum(wins + losses for wins, losses in matrix[name].values()))
+    if not names:
+        return ''
+    rows = ['<tr><th></th>' + ''.join('<th>' + html.escape(str(name)) + '</th>' for name in names) + '</tr>']
+    for name in names:
+        cells = []
+        for opponent in names:
+            wins, losses = matrix[name].get(opponent, (0, 0))
+            cells.append('<td>{}-{}</td>'.format(wins, losses) if wins or losses else '<td></td>')
+        rows.append('<tr><th>' + html.escape(str(name)) + '</th>' + ''.join(cells) + '</tr>')
+    return '<table ' + table_attributes + '><thead>' + rows[0] + '</thead><tbody>' + ''.join(rows[1:]) + '</tbody></table>'
+
+_compiled_templates = {}
+
+def compile_template(template_html):
+    '''Split an html template file into text and {{placeholder}} names, cached until the file changes'''
+    mtime = os.path.getmtime(template_html)
+    compiled = _compiled_templates.get(template_html)
+    if compiled == None or compiled[0] != mtime:
+        with open(template_html, "r") as f:
+            compiled = _compiled_templates[template_html] = (mtime, re.split(r'\{\{(\w+)\}\}', f.read()))
+    return compiled[1]
+
+def fill_template(parts, values):
+    #odd parts are placeholder names, unknown ones are kept as they are
+    return ''.join(values.get(part, '{{' + part + '}}') if i % 2 else part for i, part in enumerate(parts))
+
+class StatsRenderer:
+    '''Renders aggregated stats into an html template. Keeps the html of each section, game history page and player,
+    so only the parts whose data changed since the last render are converted again.
+
+    Every render has a revision. For templates embedding {{revision}} the renderer also keeps the delta from the
+    previous render, so live pages can patch themselves instead of reloading: the changed sections, the number of
+    game history rows to keep and the html of the rows after them, and the player rows as indexes of unchanged
+    rows or html of changed ones'''
+
+    def __init__(self, table_attributes=STATS_TABLE_ATTRIBUTES):
+        self.table_attributes = table_attributes
+        self._cache = {}
+        self._used = set()
+        self.revision = 0
+        self.delta = None
+        #html of the sections, game history pages and player rows of the last render
+        self._rendered = None
+
+    def _render(self, key, data, render):
+        #a fingerprint of the data is much cheaper than humanizing and converting it
+        fingerprint = hashlib.sha1(json.dumps(data, sort_keys=True, default=json_default).encode('utf-8')).digest()
+        cached = self._cache.get(key)
+        if cached == None or cached[0] != fingerprint:
+            cached = self._cache[key] = (fingerprint, render(data))
+        self._used.add(key)
+        return cached[1]
+
+    def render(self, aggregated_stats, start_time, template_html, htmlResourcesRelPath):
+        overall_stats = copy.copy(aggregated_stats)
+        del overall_stats['player_stats']
+        del overall_stats['game_history']
+        overall_stats.pop('head_to_head', None)
+        overall_stats.pop('head_to_head_sides', None)
+        pages = []
+        player_rows = []
+
+        def render_page(page, table_attributes):
+            page_html = self._render(('game_history', len(pages)), page, lambda data: _render_game_history_page(data, table_attributes))
+            pages.append(split_table_rows(page_html))
+            return page_html
+
+        def render_row(name, stats, table_attributes):
+            row_html = self._render(('player_stats', name), stats, lambda data: _render_player_row(name, data, table_attributes))
+            player_rows.append((name, row_html))
+            return row_html
+
+        self._used = set()
+        self.revision += 1
+        values = {
+            "start_time": start_time.strftime(TIME_FORMAT),
+            "overall_stats": self._render('overall_stats', overall_stats,
+                lambda data: json2html.convert(json = humanize(data), table_attributes = self.table_attributes)),
+            "game_history": render_game_history(aggregated_stats['game_history'], self.table_attributes, render_page),
+            "player_stats": render_player_stats(aggregated_stats['player_stats'], self.table_attributes, render_row),
+            "head_to_head": self._render('head_to_head', aggregated_stats.get('head_to_head', {}),
+                lambda data: render_head_to_head(data, self.table_attributes)),
+            "head_to_head_sides": self._render('head_to_head_sides', aggregated_stats.get('head_to_head_sides', {}),
+                lambda data: render_head_to_head(data, self.table_attributes)),
+            "html_resources": htmlResourcesRelPath,
+            "revision": str(self.revision)
+        }
+        #forget players and pages which are gone, e.g. merged into an alias
+        self._cache = {key: self._cache[key] for key in self._used}
+        template = compile_template(template_html)
+        rendered = (values, pages, player_rows)
+        self.delta = self._diff(self._rendered, rendered) if 'revision' in template[1::2] else None
+        self._rendered = rendered
+        return fill_template(template, values)
+
+    def _diff(self, previous, rendered):
+        if previous == None:
+            return None
+        previous_values, previous_pages, previous_player_rows = previous
+        values, pages, player_rows = rendered
+        delta = {'base': self.revision - 1, 'revision': self.revision, 'sections': {}}
+        for section in ('overall_stats', 'head_to_head', 'head_to_head_sides'):
+            if values[section] != previous_values[section]:
+                delta['sections'][section] = values[section]
+
+        heads = set(page[0] if page != None else None for page in pages + previous_pages)
+        if pages and previous_pages and len(heads) == 1 and None not in heads:
+            #rows up to the first changed one are kept, usually all of them but the new game is appended
+            i = 0
+            while i < min(len(pages), len(previous_pages)) and pages[i] == previous_pages[i]:
+                i += 1
+            if i < max(len(pages), len(previous_pages)):
+                keep = i * GAME_HISTORY_PAGE_SIZE
+                rows = ''
+                if i < len(pages):
+                    page_rows = split_rows(pages[i][1])
+                    previous_page_rows = split_rows(previous_pages[i][1]) if i < len(previous_pages) else []
+                    j = 0
+                    while j < min(len(page_rows), len(previous_page_rows)) and page_rows[j] == previous_page_rows[j]:
+                        j += 1
+                    keep += j
+                    rows = ''.join(page_rows[j:]) + ''.join(page[1] for page in pages[i + 1:])
+                delta['game_history'] = {'keep': keep, 'rows': rows}
+        elif values['game_history'] != previous_values['game_history']:
+            delta['sections']['game_history'] = values['game_history']
+
+        if player_rows and previous_player_rows:
+            previous_rows = {row: i for i, row in enumerate(previous_player_rows)}
+            rows = [previous_rows.get(row, row[1]) for row in player_rows]
+            if rows != list(range(len(previous_player_rows))):
+                delta['player_rows'] = rows
+        elif values['player_stats'] != previous_values['player_stats']:
+            delta['sections']['player_stats'] = values['player_stats']
+        return delta
+
+def report_aggregated_stats(aggregated_stats, aggregated_stats_json, aggregated_stats_html, start_time, template_html, htmlResourcesRelPath, renderer=None, web_server=None):
+    '''Writes the json and html reports, and publishes them to web_server if given, so it serves them without
+    reading them back'''
+    aggregated_stats = detailed_counts_as_dicts(aggregated_stats)
     base_dir = os.path.dirname(os.path.abspath(aggregated_stats_json))
     os.makedirs(base_dir, exist_ok=True)
     base_dir = os.path.dirname(os.path.abspath(aggregated_stats_html))
     os.makedirs(base_dir, exist_ok=True)
 
+    stats_json = json.dumps(aggregated_stats, indent=4, sort_keys=True, default=json_default)
     with open(aggregated_stats_json, 'w') as outfile:
-        json.dump(aggregated_stats, outfile, indent=4, sort_keys=True)
-
-    overall_stats = copy.copy(aggregated_stats)
-    del overall_stats['player_stats']
-    del overall_stats['game_history']
-    overall_stats_html = json2html.convert(json = humanize(overall_stats), table_attributes = "class=\"table table-condensed table-bordered table-hover\"")
+        outfile.write(stats_json)
 
-    game_history = humanize(aggregated_stats['game_history'], start_level=2, end_level=2)
-    game_history_html = json2html.convert(json = game_history, table_attributes = "class=\"table table-condensed table-bordered table-hover\"")
+    if renderer == None:
+        renderer = StatsRenderer()
+    stats_html = renderer.render(aggregated_stats, start_time, template_html, htmlResourcesRelPath)
+    with open(aggregated_stats_html, "w") as outfile:
+        outfile.write(stats_html)
 
-    player_stats = humanize(aggregated_stats['player_stats'], start_level=2, end_level=4)
-    player_stats_html = json2html.convert(json = player_stats, table_attributes = "class=\"table table-condensed table-bordered table-hover\"")
+    if web_server != None:
+        web_server.publish(aggregated_stats_json, stats_json.encode('utf-8'))
+        web_server.publish(aggregated_stats_html, stats_html.encode('utf-8'))
+        #after the page, so pages loaded meanwhile are not behind the delta
+        if renderer.delta != None:
+            web_server.publish_event(aggregated_stats_html, json.dumps(renderer.delta))
 
-    with open(template_html,"r") as f:
-        template_html = f.read()
-
-    template_html = template_html.replace("{{start_time}}", start_time.strftime(TIME_FORMAT))
-    template_html = template_html.replace("{{overall_stats}}", overall_stats_html)
-    template_html = template_html.replace("{{game_history}}", game_history_html)
-    template_html = template_html.replace("{{player_stats}}", player_stats_html)
-    template_html = template_html.replace("{{html_resources}}", htmlResourcesRelPath)
-    
-    with open(aggregated_stats_html, "w") as outfile:
-        outfile.write(template_html)
-
-def start_web_server(path, port=8000):
-    '''Start a simple webserver serving path on port'''
-    os.chdir(path)
-    httpd = HTTPServer(('', port), CGIHTTPRequestHandler)
-    httpd.serve_forever()
-
-def start_web_reporter(sessionStatsFolder, start_time, open_browser = False):
-    # Start the server in a new thread
-    port = 8000
-    daemon = threading.Thread(name='daemon_server',
-                              target=start_web_server,
-                              args=('.', port))
-    daemon.setDaemon(True) # Set as a daemon so it will be killed once the main thread is dead.
-    daemon.start()
+async def start_web_reporter(sessionStatsFolder, start_time, open_browser = False):
+    '''Serve the working directory from memory on the running event loop, returns the server'''
+    web_server = webserver.StatsWebServer('.', WEB_SERVER_PORT)
+    await web_server.start()
 
     # Open the web browser 
     if open_browser:
-        webbrowser.open('http://localhost:{}/{}'.format(port, get_session_stats_html_file(sessionStatsFolder, start_time)))
+        webbrowser.open('http://localhost:{}/{}'.format(WEB_SERVER_PORT, get_session_stats_html_file(sessionStatsFolder, start_time)))
+    return web_server
 
-def upload_to_surge(config, start_time, open_browser):
+async def upload_to_surge(config, start_time, open_browser):
     print_info("Uploading to surge")
-    oldcwd = os.getcwd()
-    os.chdir(config['surgeFolder'])
+    process = await asyncio.create_subprocess_shell("surge .", stdout=asyncio.subprocess.PIPE, cwd=config['surgeFolder'])
     try:
-        process = subprocess.Popen("surge .", shell=True, stdout=subprocess.PIPE)
-        result, err = process.communicate()
-        print_special2(result.decode('utf-8'))
-        if process.returncode != 0:
-            print_error("Could not run surge")
-        else:
-            surge_url = config['surgeSessionPath'] + urllib.parse.quote(start_time.strftime('%Y-%m-%d %H-%M-%S') + '/' + str(int(start_time.timestamp())) + "_session_stats")
-            print_special("surged to: " + surge_url)
-            if open_browser:
-                webbrowser.open(surge_url)
-    finally:
-        os.chdir(oldcwd)
+        result, err = await asyncio.wait_for(process.communicate(), SUBPROCESS_TIMEOUT_SECS)
+    except asyncio.TimeoutError:
+        process.kill()
+        print_error("surge did not finish in {} seconds".format(SUBPROCESS_TIMEOUT_SECS))
+        return
+    print_special2(result.decode('utf-8'))
+    if process.returncode != 0:
+        print_error("Could not run surge")
+    else:
+        surge_url = config['surgeSessionPath'] + urllib.parse.quote(start_time.strftime('%Y-%m-%d %H-%M-%S') + '/' + str(int(start_time.timestamp())) + "_session_stats")
+        print_special("surged to: " + surge_url)
+        if open_browser:
+            webbrowser.open(surge_url)
 
 def report_youtube_summary(config, start_time):
     try:
@@ -489,8 +1463,8 @@ def yrstats(ctx, config):
     ctx.obj['CONFIG'] = _read_config_yaml(ctx, config)
 
 def extract_game_stats_params(func):
-    @click.option('--stat-dmp-file', required=False, type=click.Path(exists=True), default='C:\\Program Files (x86)\\Origin Games\\Command and Conquer Red Alert II\\stats.dmp',
-        help='Full path to RA2 Yuri\'s Revenge stat.dump file, e.g. C:\\Program Files (x86)\\Origin Games\\Command and Conquer Red Alert II\\stats.dmp')
+    @click.option('--stat-dmp-file', required=False, type=click.Path(exists=True), default=DEFAULT_STATS_DMP_FILE,
+        help='Full path to RA2 Yuri\'s Revenge stat.dump file, e.g. ' + DEFAULT_STATS_DMP_FILE)
     @click.option("--use-php-parser/--no-use-php-parser", default=False)
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
@@ -498,65 +1472,263 @@ def extract_game_stats_params(func):
     return wrapper
 
 @yrstats.command(short_help="Start the stat server to continuously monitor and parse stat.dmp and keep updating game-level, session-level as well as overall stats")
-@extract_game_stats_params
+@click.option('--stat-dmp-file', 'stat_dmp_files', multiple=True, default=[DEFAULT_STATS_DMP_FILE],
+    help='Full path or glob of RA2 Yuri\'s Revenge stat.dump files, give it once per game install to watch several, e.g. ' + DEFAULT_STATS_DMP_FILE)
+@click.option("--use-php-parser/--no-use-php-parser", default=False)
 @click.option('--start-web-server', is_flag=True)
 @click.option('--open-browser', is_flag=True)
 @click.option('--show-youtube-summary', is_flag=True)
 @click.option('--publish-to-surge', is_flag=True)
 @click.option('--write-xsplit-xml', is_flag=True)
 @click.pass_context
-def start_stat_watcher(ctx, stat_dmp_file, use_php_parser, start_web_server, open_browser, show_youtube_summary, publish_to_surge, write_xsplit_xml):
+def start_stat_watcher(ctx, stat_dmp_files, use_php_parser, start_web_server, open_browser, show_youtube_summary, publish_to_surge, write_xsplit_xml):
     start_time = datetime.now()
     ctx.obj['num_games'] = 0
-    dmp_file = stat_dmp_file if stat_dmp_file != None else config['statsDmpFilePath']
+    dmp_sources = get_dmp_sources(stat_dmp_files)
+    if not dmp_sources:
+        ctx.fail("No stats.dmp file found at: " + ", ".join(stat_dmp_files))
     ctx.obj['CONFIG']['write_xsplit_xml'] = write_xsplit_xml
 
     if write_xsplit_xml:
         reset_xsplit_xml(ctx.obj['CONFIG'])
 
-    event_handler = StatsDmpWatcher(ctx.obj, ntpath.basename(dmp_file), start_time, use_php_parser)
-
-    dmp_file_base_dir = os.path.dirname(os.path.abspath(dmp_file))
-    observer = watchdog.observers.Observer()
-    print_info("Watching for changes to: " + dmp_file)
-    observer.schedule(event_handler, path=dmp_file_base_dir, recursive=False)
-    observer.start()
-
-    if start_web_server:
-        start_web_reporter(ctx.obj['CONFIG']['sessionStatsFolder'], start_time, open_browser = open_browser)
-
+    watcher = StatsDmpWatcher(ctx.obj, dmp_sources, start_time, use_php_parser)
     try:
-        while observer.is_alive():
-            observer.join(1)
+        asyncio.run(run_stat_watcher(ctx.obj['CONFIG'], watcher, start_web_server, open_browser, show_youtube_summary, publish_to_surge))
     except KeyboardInterrupt:
-        observer.stop()
-    observer.join()
+        #the session was wrapped up on the event loop already
+        pass
+
+async def run_stat_watcher(config, watcher, start_web_server, open_browser, show_youtube_summary, publish_to_surge):
+    try:
+        await watcher.run(start_web_server, open_browser)
+    except asyncio.CancelledError:
+        #ctrl+C
+        pass
 
-    if ctx.obj['num_games'] > 0:
+    if watcher.ctx_obj['num_games'] > 0:
         if publish_to_surge:
-            upload_to_surge(ctx.obj['CONFIG'], start_time, open_browser)
+            await upload_to_surge(config, watcher.start_time, open_browser)
 
         if show_youtube_summary:
-            report_youtube_summary(ctx.obj['CONFIG'], start_time)
+            report_youtube_summary(config, watcher.start_time)
 
 @yrstats.command(short_help="Extract game stats for the last game from stats.dmp, save it in game stats folder and exit")
 @extract_game_stats_params
 @click.pass_context
 def extract_game_stats(ctx, stat_dmp_file, use_php_parser):
     config = ctx.obj['CONFIG']
+    game_archive = get_game_archive(config)
+    game_index = get_game_index(config)
     if use_php_parser:
-        call_stat_dmp_parser(config, stat_dmp_file)
+        gamestats = call_stat_dmp_parser(config, stat_dmp_file)
+        if gamestats and game_index is not None:
+            game_index.add_game(gameindex.read_parsed_game(gamestats), gamestats)
+    elif game_archive is not None:
+        archive.archive_stats(game_archive, stat_dmp_file, config['thisPlayerName'])
     else:
         statparser.process_stats(
             stat_dmp_file,
             config["gameStatsFolder"],
             config['thisPlayerName'],
+            game_index,
         )
 
+@yrstats.command(short_help="Append all games archived in the game stats folder to the game archive (gameArchiveFolder)")
+@click.pass_context
+def archive_game_stats(ctx):
+    config = ctx.obj['CONFIG']
+    game_archive = get_game_archive(config)
+    if game_archive is None:
+        ctx.fail("gameArchiveFolder is not configured")
+
+    path = config['gameStatsFolder']
+    allfiles = [y for x in os.walk(path) for y in glob.glob(os.path.join(x[0], '*_stats.dmp'))]
+    appended = 0
+    with click.progressbar(sorted(allfiles, key=ntpath.basename), label='Archiving games') as bar:
+        for file_path in bar:
+            try:
+                #skip games already archived without parsing them
+                if int(ntpath.basename(file_path).split("_")[0]) in game_archive:
+                    continue
+            except ValueError:
+                pass
+            try:
+                archive.archive_stats(game_archive, file_path, config['thisPlayerName'])
+                appended += 1
+            except Exception as e:
+                print_error(file_path + " could not be archived: " + str(e))
+    print_special("Archived {} games, {} games in the archive".format(appended, len(game_archive)))
+
+@yrstats.command(short_help="Rebuild the game index (gameIndexFile) from all games in the game stats folder")
+@click.pass_context
+def index_game_stats(ctx):
+    config = ctx.obj['CONFIG']
+    if not config.get('gameIndexFile'):
+        ctx.fail("gameIndexFile is not configured")
+
+    with gameindex.GameIndex(config['gameIndexFile']) as game_index:
+        indexed = gameindex.backfill(game_index, config['gameStatsFolder'], replace=True)
+    print_special("Indexed {} games".format(indexed))
+
+@yrstats.command(short_help="Win rates of the games in the game index (gameIndexFile), filtered and grouped by player, map, side, result or opponent")
+@click.option('--group-by', multiple=True, type=click.Choice(analytics.CATEGORICAL_COLUMNS), help='Columns to group by, can be given multiple times')
+@click.option('--player', help='Only rows of this player')
+@click.option('--map', 'map_', help='Only games on this map')
+@click.option('--side', help='Only rows of players with this side')
+@click.option('--result', type=click.Choice(gameindex.PLAYER_RESULTS), help='Only rows of players with this result')
+@click.option('--opponent', help='Only rows of players against this player (games of two players)')
+@click.option('--opponent-side', help='Only rows of players against this side (games of two players)')
+@click.option('--since-time', type=click.DateTime())
+@click.option('--until-time', type=click.DateTime())
+@click.option('--min-duration', type=click.INT, help='Only games lasting at least this many seconds')
+@click.option('--max-duration', type=click.INT, help='Only games lasting at most this many seconds')
+@click.option('--limit', type=click.INT, default=50, help='Number of groups to show, by number of games')
+@click.option('--json', 'as_json', is_flag=True, help='Print the groups as JSON')
+@click.pass_context
+def analyze(ctx, group_by, player, map_, side, result, opponent, opponent_side, since_time, until_time, min_duration, max_duration, limit, as_json):
+    config = ctx.obj['CONFIG']
+    game_index = get_game_index(config)
+    if game_index is None:
+        ctx.fail("gameIndexFile is not configured")
+
+    resolve_name = get_player_registry(config).resolve
+    with game_index:
+        columns = analytics.GameColumns.from_index(game_index,
+            since=int(since_time.timestamp()) if since_time else None,
+            until=int(until_time.timestamp()) if until_time else None,
+            resolve_name=resolve_name)
+    mask = columns.mask(min_duration=min_duration, max_duration=max_duration,
+        player=resolve_name(player) if player else None, map=map_, side=side, result=result,
+        opponent=resolve_name(opponent) if opponent else None, opponent_side=opponent_side)
+    groups = columns.group_by(group_by, mask)[:limit]
+
+    if as_json:
+        click.echo(json.dumps(groups, indent=4))
+        return
+    header = [camel(key) for key in group_by] + ['Games', 'Wins', 'Win Rate', 'Avg Duration']
+    rows = [[str(group[key]) if group[key] != None else '-' for key in group_by] +
+            [str(group['games']), str(group['wins']), '{:.1%}'.format(group['win_rate']), str(timedelta(seconds=int(group['avg_duration_secs'])))]
+            for group in groups]
+    widths = [max([len(cell) for cell in column]) for column in zip(header, *rows)]
+    print_special(' '.join(cell.ljust(width) for cell, width in zip(header, widths)))
+    for row in rows:
+        print_special2(' '.join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+@yrstats.command(short_help="Aggregate or list the games matching filters, applied before reading game stats where possible")
+@click.option('--player', help='Only games of this player (or one of the aliases)')
+@click.option('--map', 'map_', help='Only games on this map')
+@click.option('--side', help='Only games with a player (the --player) of this side')
+@click.option('--result', type=click.Choice(gameindex.PLAYER_RESULTS), help='Only games with a player (the --player) of this result')
+@click.option('--min-duration', type=click.INT, help='Only games lasting at least this many seconds')
+@click.option('--max-duration', type=click.INT, help='Only games lasting at most this many seconds')
+@click.option('--since-time', type=click.DateTime())
+@click.option('--until-time', type=click.DateTime())
+@click.option('--jsonl', is_flag=True, help='Stream the matching games as JSON Lines instead of aggregating them')
+@click.pass_context
+def query(ctx, player, map_, side, result, min_duration, max_duration, since_time, until_time, jsonl):
+    config = ctx.obj['CONFIG']
+    games = iter_matching_games(config, since_time, until_time, player=player, map_=map_, side=side, result=result,
+        min_duration=min_duration, max_duration=max_duration)
+    if jsonl:
+        for data in games:
+            click.echo(json.dumps(data))
+        return
+
+    aggregated_stats = {}
+    for data in games:
+        game = records.GameRecord.from_dict(data)
+        aggregate_game_record(config, aggregated_stats, game, since_time if since_time != None else datetime.fromtimestamp(game.epoch_time))
+        if since_time == None:
+            #relative to the first matching game
+            since_time = datetime.fromtimestamp(game.epoch_time)
+    if aggregated_stats:
+        aggregated_stats = detailed_counts_as_dicts(aggregated_stats)
+    click.echo(json.dumps(aggregated_stats, indent=4, sort_keys=True, default=json_default))
+
+def _load_reparse_manifest(manifest_file, mappings_fingerprint):
+    try:
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+        if manifest['mappings'] == mappings_fingerprint:
+            return manifest
+    except (OSError, ValueError, KeyError):
+        pass
+    #missing, unreadable or made with other mappings: everything is outdated
+    return {'mappings': mappings_fingerprint, 'files': {}}
+
+def _save_reparse_manifest(manifest_file, manifest):
+    with open(manifest_file + '.tmp', 'w') as outfile:
+        json.dump(manifest, outfile)
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+def _reparse_archived_game(dmp_file, reporter_name):
+    #runs in a worker process, so report errors instead of raising them
+    try:
+        statparser.reprocess_archived_stats(dmp_file, reporter_name)
+        return dmp_file, None
+    except Exception as e:
+        return dmp_file, str(e)
+
+@yrstats.command(short_help="Parse all stats.dmp files archived in the game stats folder again, e.g. after mappings.py changed")
+@click.option('--jobs', type=click.INT, help='Number of parser processes, defaults to the number of CPU cores')
+@click.option('--force', is_flag=True, help='Also reparse games which are already up to date')
+@click.pass_context
+def reparse_archive(ctx, jobs, force):
+    config = ctx.obj['CONFIG']
+    path = config['gameStatsFolder']
+    manifest_file = get_reparse_manifest_file(path)
+    manifest = _load_reparse_manifest(manifest_file, statparser.mappings_fingerprint())
+    if force:
+        manifest['files'] = {}
+
+    allfiles = [y for x in os.walk(path) for y in glob.glob(os.path.join(x[0], '*_stats.dmp'))]
+    pending = []
+    for file_path in allfiles:
+        #up to date: reparsed with the current mappings and unchanged since
+        if manifest['files'].get(os.path.relpath(file_path, path)) == os.path.getmtime(file_path) \
+                and os.path.isfile(file_path[:-len('.dmp')] + '_parsed.json'):
+            continue
+        pending.append(file_path)
+    print_info("Reparsing {} of {} archived games".format(len(pending), len(allfiles)))
+    if not pending:
+        return
+
+    errors = []
+    reparsed_files = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_reparse_archived_game, file_path, config['thisPlayerName']) for file_path in pending]
+        try:
+            with click.progressbar(concurrent.futures.as_completed(futures), length=len(futures), label='Reparsing archive') as bar:
+                for n, future in enumerate(bar, 1):
+                    dmp_file, error = future.result()
+                    if error is None:
+                        manifest['files'][os.path.relpath(dmp_file, path)] = os.path.getmtime(dmp_file)
+                        reparsed_files.append(dmp_file[:-len('.dmp')] + '_parsed.json')
+                    else:
+                        errors.append((dmp_file, error))
+                    #checkpoint progress so an interrupted run can be resumed
+                    if n % 500 == 0:
+                        _save_reparse_manifest(manifest_file, manifest)
+        finally:
+            for future in futures:
+                future.cancel()
+            _save_reparse_manifest(manifest_file, manifest)
+            #sides and names may have changed with the mappings
+            game_index = get_game_index(config)
+            if game_index is not None:
+                with game_index:
+                    game_index.add_games((gameindex.read_parsed_game(file), file) for file in reparsed_files)
+
+    for dmp_file, error in errors:
+        print_error(dmp_file + " could not be reparsed: " + error)
+    print_special("Reparsed {} archived games".format(len(pending) - len(errors)))
+
 def base_update_stats_params(func):
     @click.option('--since-today', is_flag=True)
     @click.option('--since-last-n-days', type=click.INT)
     @click.option('--since-time', type=click.DateTime())
+    @click.option('--jobs', type=click.INT, help='Number of processes aggregating months of games, defaults to the number of CPU cores')
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         return func(*args, **kwargs)
@@ -566,10 +1738,10 @@ def base_update_stats_params(func):
 @base_update_stats_params
 @click.option('--show-youtube-summary', is_flag=True)
 @click.pass_context
-def update_session_stats(ctx, since_today, since_last_n_days, since_time, show_youtube_summary):
+def update_session_stats(ctx, since_today, since_last_n_days, since_time, jobs, show_youtube_summary):
     since_when = _get_since_when(since_today, since_last_n_days, since_time)
 
-    session_stats, processed_files, earliest_ts = aggregate_game_stats_multi(ctx.obj['CONFIG'], since_when)
+    session_stats, processed_files, earliest_ts, latest_ts = aggregate_game_stats_multi(ctx.obj['CONFIG'], since_when, jobs=jobs)
     if processed_files:
         session_stats_json = get_session_stats_json_file(ctx.obj['CONFIG']['sessionStatsFolder'], since_when)
         session_stats_html = get_session_stats_html_file(ctx.obj['CONFIG']['sessionStatsFolder'], since_when)
@@ -578,19 +1750,50 @@ def update_session_stats(ctx, since_today, since_last_n_days, since_time, show_y
     if show_youtube_summary:
         report_youtube_summary(session_stats)
 
-@yrstats.command(short_help="Generate overall stat data from the parsed games in the game stats folder")
+@yrstats.command(short_help="Generate overall stat data from the parsed games in the game stats folder, only adding games newer than the last checkpoint unless a since parameter is given")
 @base_update_stats_params
+@click.option('--full-rebuild', is_flag=True, help='Rebuild the overall stats from all games in the game stats folder')
 @click.pass_context
-def update_overall_stats(ctx, since_today, since_last_n_days, since_time):
-    since_when = _get_since_when(since_today, since_last_n_days, since_time)
-
-    overall_stats, processed_files, earliest_ts = aggregate_game_stats_multi(ctx.obj['CONFIG'], since_when)
-    if processed_files:
-        overall_stats_json = get_overall_stats_json_file(ctx.obj['CONFIG']['overallStatsFolder'])
-        overall_stats_html = get_overall_stats_html_file(ctx.obj['CONFIG']['overallStatsFolder'])
+def update_overall_stats(ctx, since_today, since_last_n_days, since_time, jobs, full_rebuild):
+    config = ctx.obj['CONFIG']
+    overall_stats = None
+    checkpoint = None
+    renamed = 0
+    if full_rebuild:
+        since_when = GAME_RELEASE_TIME
+    elif since_today or since_last_n_days != None or since_time != None:
+        since_when = _get_since_when(since_today, since_last_n_days, since_time)
+    else:
+        #incremental update: fold only the games newer than the checkpoint into the saved overall stats
+        try:
+            overall_stats, checkpoint = load_overall_stats_checkpoint(config)
+        except (OSError, ValueError) as e:
+            print_error("Could not load overall stats: " + str(e))
+        if checkpoint == None:
+            print_error("No valid overall stats checkpoint, use --full-rebuild or a since parameter once")
+            sys.exit(1)
+        since_when = datetime.fromtimestamp(checkpoint['epoch_time'])
+        print_info("Adding games since the overall stats checkpoint: " + since_when.strftime(TIME_FORMAT))
+        #aliases added to the config since apply to the saved stats too, without a full rebuild
+        renamed = reattribute_player_aliases(config, overall_stats)
+        if renamed:
+            print_info("Re-attributed the stats of {} player names to their aliases".format(renamed))
+
+    overall_stats, processed_files, earliest_ts, latest_ts = aggregate_game_stats_multi(config, since_when, overall_stats, jobs)
+    if processed_files or renamed:
+        overall_stats_json = get_overall_stats_json_file(config['overallStatsFolder'])
+        overall_stats_html = get_overall_stats_html_file(config['overallStatsFolder'])
         for game_history in overall_stats['game_history']:
-            del game_history['relative_start_time']
-        report_aggregated_stats(overall_stats, overall_stats_json, overall_stats_html, earliest_ts, ctx.obj['CONFIG']['htmlTemplateOverall'], ctx.obj['CONFIG']['htmlResourcesRelPathOverall'])
+            if 'relative_start_time' in game_history:
+                del game_history['relative_start_time']
+        start_time = earliest_ts if checkpoint == None else datetime.fromtimestamp(checkpoint['start_time'])
+        report_aggregated_stats(overall_stats, overall_stats_json, overall_stats_html, start_time, config['htmlTemplateOverall'], config['htmlResourcesRelPathOverall'])
+        epoch_time = int(latest_ts.timestamp()) if latest_ts != None else checkpoint['epoch_time']
+        if checkpoint != None:
+            epoch_time = max(checkpoint['epoch_time'], epoch_time)
+        save_overall_stats_checkpoint(config, int(start_time.timestamp()), epoch_time)
+    elif checkpoint != None:
+        print_info("Overall stats are up to date")
 
 if __name__ == '__main__':
     colorama.init(autoreset=True)